@@ -1,13 +1,8 @@
-PROGRAM="python3 src/main.py"
+PROGRAM="python3 src/run_batch.py"
 INDIR="$1"
 OUTDIR="$2"
 echo "program=<$PROGRAM> indir=<$INDIR> outdir=<$OUTDIR>"
 
-INS="`seq 1 23`"
-INPRE="test"
-OUTPRE="out"
-
-for f in ${INS}; do
-	echo "${PROGRAM} < ${INDIR}/${INPRE}${f} > ${OUTDIR}/${OUTPRE}${f}"
-	${PROGRAM} < ${INDIR}/${INPRE}${f}.txt > ${OUTDIR}/${OUTPRE}${f}.txt_out &
-done
\ No newline at end of file
+# Runs every ${INDIR}/test*.txt on a process pool and writes ${OUTDIR}/out*.txt_out
+# (use `python3 src/run_batch.py INDIR OUTDIR` to compare against them instead)
+${PROGRAM} "${INDIR}" "${OUTDIR}" --write
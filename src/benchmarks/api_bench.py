@@ -0,0 +1,79 @@
+# Runs the same synthetic trace through the text front end (parse every line,
+# format every event) and through the embedded API (tuples submitted in
+# batches, outcomes returned, no event output) and compares the throughput.
+#
+#   python src/benchmarks/api_bench.py --txns 20000 --batch 64
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.api import Engine
+from dbms.constants import Action
+from dbms.events import TextSink
+from dbms.input_parser import Parser
+from gen_workload import add_workload_args, generator_from_args
+
+_NAMES = {Action.BEGIN: 'begin', Action.BEGIN_RO: 'beginRO', Action.END: 'end', Action.FAIL: 'fail',
+          Action.RECOVER: 'recover', Action.DUMP: 'dump', Action.STATS: 'stats'}
+
+
+def to_tuple(op):
+    if op.action == Action.READ:
+        return ('R', op.txn_id, op.var_id)
+    if op.action == Action.WRITE:
+        return ('W', op.txn_id, op.var_id, op.var_val)
+    if op.site_id is not None:
+        return (_NAMES[op.action], op.site_id)
+    if op.txn_id is not None:
+        return (_NAMES[op.action], op.txn_id)
+    return (_NAMES[op.action],)
+
+
+def run_text(trace, numOfSites, numOfVars):
+    db = DB(numOfSites, numOfVars)
+    out = io.StringIO()
+    start = time.perf_counter()
+    db.run(Parser(io.StringIO(trace)), TextSink(out))
+    return time.perf_counter() - start
+
+
+def run_api(instructions, numOfSites, numOfVars, batchSize):
+    engine = Engine(DB(numOfSites, numOfVars))
+    start = time.perf_counter()
+    for i in range(0, len(instructions), batchSize):
+        engine.submit(instructions[i:i + batchSize])
+    elapsed = time.perf_counter() - start
+    dump = engine.dump()
+    engine.close()
+    return elapsed, dump
+
+
+def main():
+    parser = argparse.ArgumentParser(description='text front end vs. embedded API throughput')
+    add_workload_args(parser)
+    parser.add_argument('--batch', type=int, default=64, help='instructions per submit() call')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each mode, the fastest is kept')
+    args = parser.parse_args()
+
+    lines = list(generator_from_args(args))
+    trace = '\n'.join(lines) + '\n'
+    instructions = [to_tuple(op) for op in Parser(io.StringIO(trace))]
+    numOfOps = len(instructions)
+
+    textTime = min(run_text(trace, args.sites, args.vars) for _ in range(args.repeat))
+    apiTime = min(run_api(instructions, args.sites, args.vars, args.batch)[0] for _ in range(args.repeat))
+    singleTime = min(run_api(instructions, args.sites, args.vars, 1)[0] for _ in range(args.repeat))
+    print(f'{numOfOps} instructions')
+    print(f'{"mode":>16} {"ops/sec":>12}')
+    print(f'{"text":>16} {numOfOps / textTime:>12.0f}')
+    print(f'{"api batch " + str(args.batch):>16} {numOfOps / apiTime:>12.0f}')
+    print(f'{"api batch 1":>16} {numOfOps / singleTime:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Measures the latency of end() (commit) and of aborts as the number of sites
+# grows. Every transaction reads and writes a few non-replicated variables, so
+# its footprint is a handful of sites whatever the size of the cluster.
+#
+#   python src/benchmarks/commit_bench.py [--sites 10 100 1000] [--txns 2000]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.constants import Action
+from dbms.events import EventSink
+from dbms.input_parser import Operation
+from dbms.transaction_manager import TransactionManager
+from run_bench import percentile
+
+
+def make_op(timestamp, action, txnId=None, varId=None, varVal=None):
+    return Operation(timestamp, action, txnId, varId, var_val=varVal)
+
+
+def run(numOfSites, numOfTxns, opsPerTxn, seed):
+    # two variables per site, the odd indexed one lives at a single site
+    numOfVars = 2 * numOfSites
+    db = DB(numOfSites, numOfVars)
+    tm = TransactionManager(db.sites, db.placement, EventSink())
+    rand = random.Random(seed)
+    clock = time.perf_counter
+    commitTimes = list()
+    abortTimes = list()
+    timestamp = 0
+    for txnId in range(1, numOfTxns + 1):
+        tm._handle_operation(make_op(timestamp, Action.BEGIN, txnId))
+        for _ in range(opsPerTxn):
+            timestamp += 1
+            varId = 2 * rand.randrange(numOfSites) + 1
+            if rand.random() < 0.5:
+                tm._handle_operation(make_op(timestamp, Action.READ, txnId, varId))
+            else:
+                tm._handle_operation(make_op(timestamp, Action.WRITE, txnId, varId, txnId))
+        timestamp += 1
+        # one transaction in ten aborts instead of committing
+        if txnId % 10 == 0:
+            start = clock()
+            tm.abort(txnId)
+            abortTimes.append(clock() - start)
+        else:
+            start = clock()
+            tm._handle_operation(make_op(timestamp, Action.END, txnId))
+            commitTimes.append(clock() - start)
+        timestamp += 1
+    db.close()
+    commitTimes.sort()
+    abortTimes.sort()
+    return commitTimes, abortTimes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='commit/abort latency vs. number of sites')
+    parser.add_argument('--sites', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--txns', type=int, default=2000)
+    parser.add_argument('--ops', type=int, default=4, help='reads/writes per transaction')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f'{"sites":>6} {"commit p50 us":>14} {"commit p99 us":>14} {"abort p50 us":>13} {"abort p99 us":>13}')
+    for numOfSites in args.sites:
+        commitTimes, abortTimes = run(numOfSites, args.txns, args.ops, args.seed)
+        print(f'{numOfSites:>6} {percentile(commitTimes, 50) * 1e6:>14.1f} {percentile(commitTimes, 99) * 1e6:>14.1f} '
+              f'{percentile(abortTimes, 50) * 1e6:>13.1f} {percentile(abortTimes, 99) * 1e6:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
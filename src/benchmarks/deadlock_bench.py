@@ -0,0 +1,129 @@
+# Measures the cost of deadlock detection as the number of live and finished
+# transactions grows.
+#
+#   python src/benchmarks/deadlock_bench.py [--sizes 1000 10000 50000] [--compare-legacy]
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.constants import Action
+from dbms.events import EventSink
+from dbms.input_parser import Operation
+from dbms.transaction_manager import TransactionManager
+
+
+def make_op(timestamp, action, txnId=None, varId=None, varVal=None):
+    return Operation(timestamp, action, txnId, varId, var_val=varVal)
+
+
+def legacy_detect(tm):
+    # Full-graph recursive DFS from every transaction ever seen (the detector
+    # this benchmark is compared against). Only detects, never resolves.
+    graph = tm.deadlockPolicy.graph
+
+    def has_cycle(currTrxId, visited):
+        if currTrxId in visited:
+            return True
+        if currTrxId not in graph:
+            return False
+        visited.add(currTrxId)
+        for waitingTrxId in graph[currTrxId]:
+            if has_cycle(waitingTrxId, visited):
+                return True
+        visited.remove(currTrxId)
+        return False
+
+    for trxId in list(tm.idToTransactions.keys()):
+        if has_cycle(trxId, set()):
+            return True
+    return False
+
+
+class TimedDetector:
+    def __init__(self, detector):
+        self.detector = detector
+        self.elapsed = 0.0
+        self.calls = 0
+
+    def findCycleThroughEdge(self, holderId, waiterId):
+        start = time.perf_counter()
+        cycle = self.detector.findCycleThroughEdge(holderId, waiterId)
+        self.elapsed += time.perf_counter() - start
+        self.calls += 1
+        return cycle
+
+
+def run(size, blockedOps, compareLegacy):
+    # `size` finished transactions plus `size` live transactions; live
+    # transaction 2k+1 write-locks a variable that transaction 2k then waits for.
+    numOfLive = size
+    db = DB(numOfSites=10, numOfVars=2 * numOfLive + 1)
+    tm = TransactionManager(db.sites, db.placement, EventSink())
+    clock = 0
+    for txnId in range(1, size + 1):
+        tm._handle_operation(make_op(clock, Action.BEGIN, txnId))
+        tm._handle_operation(make_op(clock + 1, Action.END, txnId))
+        clock += 2
+    firstLive = size + 1
+    for i in range(numOfLive):
+        txnId = firstLive + i
+        tm._handle_operation(make_op(clock, Action.BEGIN, txnId))
+        # odd indexed variables live at a single site
+        tm._handle_operation(make_op(clock + 1, Action.WRITE, txnId, 2 * i + 1, 0))
+        clock += 2
+
+    pairs = min(blockedOps, numOfLive // 2)
+    detector = tm.deadlockPolicy.detector = TimedDetector(tm.deadlockPolicy.detector)
+    start = time.perf_counter()
+    for k in range(pairs):
+        waiter = firstLive + 2 * k
+        holderVar = 2 * (2 * k + 1) + 1
+        tm._handle_operation(make_op(clock, Action.WRITE, waiter, holderVar, 1))
+        clock += 1
+    perOp = (time.perf_counter() - start) / max(1, pairs)
+    detectPerEdge = detector.elapsed / max(1, detector.calls)
+
+    # close every pair into a cycle; each is resolved by killing the younger
+    start = time.perf_counter()
+    for k in range(pairs):
+        holder = firstLive + 2 * k + 1
+        waiterVar = 2 * (2 * k) + 1
+        tm._handle_operation(make_op(clock, Action.WRITE, holder, waiterVar, 1))
+        clock += 1
+        tm.pending_operations.clear()
+    perCycle = (time.perf_counter() - start) / max(1, pairs)
+
+    legacyPerCall = None
+    if compareLegacy:
+        calls = 20
+        start = time.perf_counter()
+        for _ in range(calls):
+            legacy_detect(tm)
+        legacyPerCall = (time.perf_counter() - start) / calls
+    return perOp, detectPerEdge, perCycle, legacyPerCall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='deadlock detection benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 30000])
+    parser.add_argument('--blocked-ops', type=int, default=500)
+    parser.add_argument('--compare-legacy', action='store_true')
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    print(f'{"finished+live txns":>20} {"blocked op (us)":>16} {"detect (us)":>12} {"cycle + abort (us)":>19}'
+          + (f' {"legacy detect (us)":>19}' if args.compare_legacy else ''))
+    for size in args.sizes:
+        perOp, detect, perCycle, legacy = run(size, args.blocked_ops, args.compare_legacy)
+        line = f'{2 * size:>20} {perOp * 1e6:>16.1f} {detect * 1e6:>12.2f} {perCycle * 1e6:>19.1f}'
+        if legacy is not None:
+            line += f' {legacy * 1e6:>19.1f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Compares the deadlock policies (cycle detection, wait-die, wound-wait and the
+# wait timeout) on the same seeded workloads at several contention levels: the
+# fewer variables, the more transactions collide.
+#
+#   python src/benchmarks/deadlock_policy_bench.py [--vars 200 50 20 10] [--txns 5000] [--json out.json]
+import argparse
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbms.deadlock import DEADLOCK_POLICIES, make_deadlock_policy
+from dbms.input_parser import Parser
+from dbms.workload import WorkloadGenerator
+from run_bench import run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='deadlock policy comparison')
+    parser.add_argument('--vars', type=int, nargs='+', default=[200, 50, 20, 10],
+                        help='numbers of variables, one contention level each')
+    parser.add_argument('--policies', nargs='+', choices=sorted(DEADLOCK_POLICIES),
+                        default=['detect', 'wait-die', 'wound-wait', 'timeout'])
+    parser.add_argument('--deadlock-timeout', type=int, default=None, help='wait limit in ticks of the timeout policy')
+    parser.add_argument('--txns', type=int, default=5000)
+    parser.add_argument('--sites', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--ops-per-txn', type=int, default=5)
+    parser.add_argument('--zipf', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    print(f'{"vars":>6} {"policy":>11} {"ops/sec":>9} {"commits":>8} {"aborts":>7} {"abort rate":>11} '
+          f'{"commits/sec":>12}')
+    results = list()
+    for numOfVars in args.vars:
+        generator = WorkloadGenerator(seed=args.seed, numOfTxns=args.txns, numOfVars=numOfVars,
+                                      numOfSites=args.sites, concurrency=args.concurrency,
+                                      opsPerTxn=args.ops_per_txn, zipfS=args.zipf, roShare=0.0)
+        operations = list(Parser(io.StringIO('\n'.join(generator))))
+        for name in args.policies:
+            result = run(operations, args.sites, numOfVars, deadlockPolicy=make_deadlock_policy(name, args.deadlock_timeout))
+            elapsed = result['elapsed_sec']
+            print(f'{numOfVars:>6} {name:>11} {result["ops_per_sec"]:>9.0f} {result["commits"]:>8} '
+                  f'{result["aborts"]:>7} {result["abort_rate"]:>11.1%} '
+                  f'{result["commits"] / elapsed if elapsed else 0.0:>12.0f}')
+            results.append({'vars': numOfVars, 'policy': name, 'results': result})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': vars(args), 'runs': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# Writes a synthetic trace in the input grammar to stdout (or --out).
+#
+#   python src/benchmarks/gen_workload.py --txns 10000 --zipf 1.1 --fail-rate 0.001 > trace.txt
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dbms.workload import WorkloadGenerator
+
+
+def add_workload_args(parser):
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--txns', type=int, default=1000, help='number of transactions')
+    parser.add_argument('--sites', type=int, default=10, help='number of sites')
+    parser.add_argument('--vars', type=int, default=20, help='number of variables')
+    parser.add_argument('--concurrency', type=int, default=8, help='transactions active at the same time')
+    parser.add_argument('--ops-per-txn', type=int, default=5)
+    parser.add_argument('--read-ratio', type=float, default=0.5, help='share of reads in read-write transactions')
+    parser.add_argument('--zipf', type=float, default=0.0, help='Zipf exponent of variable popularity (0: uniform)')
+    parser.add_argument('--ro-share', type=float, default=0.1, help='share of read-only transactions')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='probability of a site failure per line')
+    parser.add_argument('--recover-after', type=int, default=20, help='max lines before a failed site recovers')
+
+
+def generator_from_args(args):
+    return WorkloadGenerator(
+        seed=args.seed, numOfTxns=args.txns, numOfVars=args.vars, numOfSites=args.sites,
+        concurrency=args.concurrency, opsPerTxn=args.ops_per_txn, readRatio=args.read_ratio,
+        zipfS=args.zipf, roShare=args.ro_share, failureRate=args.fail_rate,
+        recoverAfter=args.recover_after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='synthetic workload generator')
+    add_workload_args(parser)
+    parser.add_argument('--out', default=None, help='output file (default: stdout)')
+    args = parser.parse_args()
+
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        for line in generator_from_args(args):
+            out.write(line + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
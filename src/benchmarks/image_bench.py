@@ -0,0 +1,53 @@
+# Startup time of a DB built from scratch vs. loaded from a database image,
+# for several numbers of variables and both site stores.
+#
+#   python src/benchmarks/image_bench.py --sites 20 --vars 1000 100000 1000000
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.var_store import STORES
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DB startup time from scratch vs. from an image')
+    parser.add_argument('--sites', type=int, default=DB.NUM_OF_SITES)
+    parser.add_argument('--vars', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--stores', nargs='+', choices=sorted(STORES), default=sorted(STORES))
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each mode, the fastest is kept')
+    args = parser.parse_args()
+
+    tmpDir = tempfile.mkdtemp(prefix='image_bench')
+    try:
+        print(f'{"store":>9} {"vars":>9} {"scratch s":>10} {"image s":>10} {"speedup":>8} {"image MB":>9}')
+        for numOfVars in args.vars:
+            path = os.path.join(tmpDir, f'{numOfVars}.img')
+            DB(args.sites, numOfVars).saveImage(path)
+            size = os.path.getsize(path) / 2 ** 20
+            for store in args.stores:
+                scratchTime = timed(lambda: DB(args.sites, numOfVars, store=store), args.repeat)
+                imageTime = timed(lambda: DB(store=store, image=path), args.repeat)
+                print(f'{store:>9} {numOfVars:>9} {scratchTime:>10.4f} {imageTime:>10.4f} '
+                      f'{scratchTime / imageTime:>8.2f} {size:>9.1f}')
+    finally:
+        shutil.rmtree(tmpDir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
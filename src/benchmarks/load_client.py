@@ -0,0 +1,138 @@
+# Opens many concurrent connections to a RepCRec server (python src/main.py
+# --serve) and runs seeded read/write transactions on each of them, then
+# reports the instruction throughput and latency percentiles.
+#
+#   python src/benchmarks/load_client.py --clients 32 --txns 200
+#   python src/benchmarks/load_client.py --start-server --clients 32 --txns 200
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.server import DONE, Server
+from run_bench import percentile
+
+
+async def request(reader, writer, line):
+    writer.write((line + '\n').encode())
+    await writer.drain()
+    replies = list()
+    while True:
+        reply = (await reader.readline()).decode()
+        if not reply:
+            raise ConnectionError('server closed the connection')
+        reply = reply.rstrip('\n')
+        if reply == DONE:
+            return replies
+        replies.append(reply)
+
+
+async def run_client(args, clientIdx, txnIds, latencies, counts):
+    rand = random.Random(args.seed * 100003 + clientIdx)
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    clock = time.perf_counter
+
+    async def timed(kind, line):
+        start = clock()
+        replies = await request(reader, writer, line)
+        latencies[kind].append(clock() - start)
+        return replies
+
+    try:
+        for _ in range(args.txns):
+            txnId = next(txnIds)
+            await timed('begin', f'begin(T{txnId})')
+            for _ in range(args.ops):
+                varId = rand.randint(1, args.vars)
+                if rand.random() < args.read_ratio:
+                    await timed('read', f'R(T{txnId},x{varId})')
+                else:
+                    await timed('write', f'W(T{txnId},x{varId},{rand.randint(0, 9999)})')
+            replies = await timed('end', f'end(T{txnId})')
+            if any(reply.endswith(' commits') for reply in replies):
+                counts['commits'] += 1
+            else:
+                counts['aborts'] += 1
+    finally:
+        writer.close()
+
+
+async def run(args):
+    server = None
+    if args.start_server:
+        server = Server(DB(args.sites, args.vars), args.host, 0)
+        await server.start()
+        args.port = server.port
+
+    latencies = defaultdict(list)
+    counts = defaultdict(int)
+    txnIds = itertools.count(args.first_txn)
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(args, i, txnIds, latencies, counts) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+        server.db.close()
+
+    numOfRequests = sum(len(v) for v in latencies.values())
+    result = {
+        'clients': args.clients,
+        'requests': numOfRequests,
+        'elapsed_sec': elapsed,
+        'requests_per_sec': numOfRequests / elapsed if elapsed else 0.0,
+        'commits': counts['commits'],
+        'aborts': counts['aborts'],
+        'latency_us': {},
+    }
+    for kind, vals in latencies.items():
+        vals.sort()
+        result['latency_us'][kind] = {
+            'count': len(vals),
+            'p50': percentile(vals, 50) * 1e6,
+            'p90': percentile(vals, 90) * 1e6,
+            'p99': percentile(vals, 99) * 1e6,
+            'max': vals[-1] * 1e6,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RepCRec load generating client')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7070)
+    parser.add_argument('--start-server', action='store_true', help='run the server in this process on a free port')
+    parser.add_argument('--sites', type=int, default=DB.NUM_OF_SITES, help='number of sites with --start-server')
+    parser.add_argument('--vars', type=int, default=DB.NUM_OF_VARS)
+    parser.add_argument('--clients', type=int, default=16, help='number of concurrent connections')
+    parser.add_argument('--txns', type=int, default=100, help='transactions per client')
+    parser.add_argument('--ops', type=int, default=4, help='reads/writes per transaction')
+    parser.add_argument('--read-ratio', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--first-txn', type=int, default=1, help='first transaction id (ids must be unused on the server)')
+    parser.add_argument('--json', default=None, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(f'{result["requests"]} requests from {result["clients"]} clients in {result["elapsed_sec"]:.3f}s '
+          f'({result["requests_per_sec"]:.0f} requests/sec)')
+    print(f'commits: {result["commits"]}  aborts: {result["aborts"]}')
+    print(f'{"request":>10} {"count":>8} {"p50 us":>9} {"p90 us":>9} {"p99 us":>9} {"max us":>9}')
+    for kind, lat in sorted(result['latency_us'].items()):
+        print(f'{kind:>10} {lat["count"]:>8} {lat["p50"]:>9.1f} {lat["p90"]:>9.1f} '
+              f'{lat["p99"]:>9.1f} {lat["max"]:>9.1f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# Drives DB/TransactionManager in-process over a synthetic (or given) trace and
+# reports throughput, per-action latency percentiles, deadlock/abort rates and
+# peak memory. Results are written as JSON so runs can be compared.
+#
+#   python src/benchmarks/run_bench.py --txns 20000 --zipf 1.1 --json results.json
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.constants import Event
+from dbms.deadlock import DEADLOCK_POLICIES, make_deadlock_policy
+from dbms.scheduler import SCHEDULERS
+from dbms.events import CounterSink
+from dbms.input_parser import Parser
+from dbms.transaction_manager import TransactionManager
+from gen_workload import add_workload_args, generator_from_args
+
+
+def percentile(sortedVals, q):
+    if not sortedVals:
+        return 0.0
+    idx = min(len(sortedVals) - 1, int(round(q / 100.0 * (len(sortedVals) - 1))))
+    return sortedVals[idx]
+
+
+def run(operations, numOfSites, numOfVars, traceMemory=False, store='dict', deadlockPolicy=None, scheduler=None):
+    db = DB(numOfSites, numOfVars, store=store)
+    events = CounterSink()
+    tm = TransactionManager(db.sites, db.placement, events, deadlockPolicy, scheduler)
+
+    latencies = defaultdict(list)
+    handle = tm._handle_operation
+    clock = time.perf_counter
+
+    def timed_handle(op):
+        start = clock()
+        handle(op)
+        latencies[op.action].append(clock() - start)
+
+    tm._handle_operation = timed_handle
+    if traceMemory:
+        tracemalloc.start()
+    start = clock()
+    tm.start(operations)
+    elapsed = clock() - start
+    peakTraced = None
+    if traceMemory:
+        peakTraced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    numOfOps = sum(len(v) for v in latencies.values())
+    counts = events.counts
+    begun = counts[Event.BEGIN] + counts[Event.BEGIN_RO]
+    result = {
+        'operations': numOfOps,
+        'elapsed_sec': elapsed,
+        'ops_per_sec': numOfOps / elapsed if elapsed else 0.0,
+        'transactions': begun,
+        'commits': counts[Event.COMMIT],
+        'aborts': counts[Event.ABORT],
+        'deadlocks': counts[Event.DEADLOCK_DETECTED],
+        'wait_die_aborts': counts[Event.WAIT_DIE],
+        'wound_wait_aborts': counts[Event.WOUND_WAIT],
+        'timeout_aborts': counts[Event.WAIT_TIMEOUT],
+        'abort_rate': counts[Event.ABORT] / begun if begun else 0.0,
+        'deadlock_rate': counts[Event.DEADLOCK_DETECTED] / begun if begun else 0.0,
+        'latency_us': {},
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'peak_traced_bytes': peakTraced,
+        'events': {e.name.lower(): n for e, n in counts.items()},
+    }
+    for action, vals in latencies.items():
+        vals.sort()
+        result['latency_us'][action.name.lower()] = {
+            'count': len(vals),
+            'mean': sum(vals) / len(vals) * 1e6,
+            'p50': percentile(vals, 50) * 1e6,
+            'p90': percentile(vals, 90) * 1e6,
+            'p99': percentile(vals, 99) * 1e6,
+            'max': vals[-1] * 1e6,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RepCRec benchmark harness')
+    add_workload_args(parser)
+    parser.add_argument('--trace', default=None, help='run this trace file instead of a generated one')
+    parser.add_argument('--trace-memory', action='store_true', help='measure peak Python heap with tracemalloc (slower)')
+    parser.add_argument('--store', choices=['dict', 'columnar'], default='dict', help='storage of the site variables')
+    parser.add_argument('--deadlock', choices=sorted(DEADLOCK_POLICIES), default='detect', help='deadlock policy')
+    parser.add_argument('--deadlock-timeout', type=int, default=None, help='wait limit in ticks with --deadlock timeout')
+    parser.add_argument('--scheduler', choices=sorted(SCHEDULERS), default='wake-all',
+                        help='retry of operations on hold')
+    parser.add_argument('--json', default=None, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.trace:
+        operations = list(Parser(args.trace))
+        workload = {'trace': args.trace}
+    else:
+        generator = generator_from_args(args)
+        operations = list(Parser(io.StringIO('\n'.join(generator))))
+        workload = generator.config()
+
+    result = run(operations, args.sites, args.vars, args.trace_memory, args.store,
+                 make_deadlock_policy(args.deadlock, args.deadlock_timeout), SCHEDULERS[args.scheduler]())
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'workload': workload,
+        'store': args.store,
+        'deadlock': args.deadlock,
+        'scheduler': args.scheduler,
+        'results': result,
+    }
+
+    print(f'{result["operations"]} operations in {result["elapsed_sec"]:.3f}s '
+          f'({result["ops_per_sec"]:.0f} ops/sec)')
+    print(f'transactions: {result["transactions"]}  commits: {result["commits"]}  '
+          f'aborts: {result["aborts"]} ({result["abort_rate"]:.1%})  '
+          f'deadlocks: {result["deadlocks"]} ({result["deadlock_rate"]:.1%})')
+    print(f'{"action":>10} {"count":>8} {"p50 us":>9} {"p90 us":>9} {"p99 us":>9} {"max us":>9}')
+    for action, lat in sorted(result['latency_us'].items()):
+        print(f'{action:>10} {lat["count"]:>8} {lat["p50"]:>9.1f} {lat["p90"]:>9.1f} '
+              f'{lat["p99"]:>9.1f} {lat["max"]:>9.1f}')
+    print(f'peak RSS: {result["peak_rss_kb"]} KB' + (
+        f'  peak traced heap: {result["peak_traced_bytes"]} B' if result['peak_traced_bytes'] is not None else ''))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
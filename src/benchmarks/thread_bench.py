@@ -0,0 +1,67 @@
+# Runs one synthetic trace with the ParallelExecutor at several thread counts
+# and reports throughput, how many reads and writes ran in parallel waves, and
+# whether the output is the same as with one thread.
+#
+#   python src/benchmarks/thread_bench.py --threads 1 2 4 8 --txns 5000 --vars 1000 --concurrency 32
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import DB
+from dbms.api import Engine
+from dbms.events import TextSink
+from dbms.executor import ParallelExecutor
+from dbms.input_parser import Parser
+from gen_workload import add_workload_args, generator_from_args
+
+
+def run(trace, numOfThreads, args):
+    dataDir = tempfile.mkdtemp(prefix='thread_bench') if args.durable else None
+    try:
+        db = DB(args.sites, args.vars, dataDir, distributed=args.distributed)
+        out = io.StringIO()
+        engine = Engine(db, TextSink(out))
+        executor = ParallelExecutor(engine.tm, numOfThreads)
+        start = time.perf_counter()
+        executor.run(Parser(io.StringIO(trace)))
+        elapsed = time.perf_counter() - start
+        db.close()
+    finally:
+        if dataDir is not None:
+            shutil.rmtree(dataDir, ignore_errors=True)
+    return elapsed, executor, zlib.crc32(out.getvalue().encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ParallelExecutor throughput vs. number of threads')
+    add_workload_args(parser)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--distributed', action='store_true', help='run every site in its own worker process')
+    parser.add_argument('--durable', action='store_true', help='keep a write-ahead log in a temporary directory')
+    args = parser.parse_args()
+
+    trace = '\n'.join(generator_from_args(args)) + '\n'
+    numOfOps = sum(1 for _ in Parser(io.StringIO(trace)))
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'{numOfOps} instructions, {os.cpu_count()} cpu(s), GIL {"enabled" if gil else "disabled"}')
+    print(f'{"threads":>7} {"ops/sec":>10} {"speedup":>8} {"waves":>7} {"ops in waves":>13} {"same output":>12}')
+    baseTime = None
+    baseOutput = None
+    for numOfThreads in args.threads:
+        elapsed, executor, output = run(trace, numOfThreads, args)
+        if baseTime is None:
+            baseTime = elapsed
+            baseOutput = output
+        print(f'{numOfThreads:>7} {numOfOps / elapsed:>10.0f} {baseTime / elapsed:>8.2f} {executor.waves:>7} '
+              f'{executor.parallelOps:>13} {"yes" if output == baseOutput else "NO":>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+from .constants import AbortCause, Action, Event
+from .events import EventSink, format_text
+from .input_parser import Operation, _NO_ARG_ACTIONS, _SITE_ACTIONS, _TXN_ACTIONS
+from .transaction_manager import TransactionManager
+
+# Embedded API: drives a TransactionManager with Operations built from Python
+# calls instead of parsed text and hands back the outcome of every instruction
+# (the value read, the sites written, whether the transaction committed).
+# Events still go to the given sink (silent by default), so the text front end
+# is the same engine with a parser in front and a TextSink behind.
+#
+#   engine = Engine(DB())
+#   with engine.begin() as t:
+#       t.write(2, 10)
+#       val = t.read(4)       # a value, or a Blocked handle if it has to wait
+#   engine.submit([('begin', 7), ('R', 7, 2), ('end', 7)])
+
+# events that answer the instruction being handled
+_RECORDED_EVENTS = frozenset((
+    Event.READ, Event.WRITE, Event.RW_FAIL, Event.READ_FAIL, Event.RO_READ_FAIL, Event.TXN_FINISHED,
+    Event.UNKNOWN_TXN, Event.VALUE_OUT_OF_RANGE, Event.DUMP_SITE, Event.STATS,
+))
+_ABORTED_EVENTS = (Event.RW_FAIL, Event.READ_FAIL, Event.RO_READ_FAIL)
+
+
+class TransactionError(Exception):
+    # The instruction names a transaction that cannot run it (already
+    # committed, never began, or begun twice), or writes a value no site can
+    # store
+    def __init__(self, trxId, message: str) -> None:
+        super().__init__(message)
+        self.trxId = trxId
+
+
+class TransactionAborted(TransactionError):
+    pass
+
+
+class Blocked:
+    # Read or write put on hold; it runs when a later instruction releases what
+    # it waits on, or is dropped if its transaction aborts meanwhile
+    def __init__(self, engine, op: Operation) -> None:
+        self.engine = engine
+        self.op = op
+        self.outcome = None
+        self.settled = False
+
+    @property
+    def done(self) -> bool:
+        if not self.settled and self.op not in self.engine.tm.waitingOperations:
+            self.engine._settle(self)
+        return self.settled
+
+    def result(self):
+        if not self.done:
+            raise RuntimeError(f'{self.op} is still waiting')
+        if isinstance(self.outcome, TransactionError):
+            raise self.outcome
+        return self.outcome
+
+    def __repr__(self) -> str:
+        return f'Blocked{self.op}'
+
+
+class Txn:
+    # Context manager: commits on a normal exit, aborts if the block raises
+    def __init__(self, engine, trxId: int, readOnly: bool) -> None:
+        self.engine = engine
+        self.id = trxId
+        self.readOnly = readOnly
+
+    @property
+    def live(self) -> bool:
+        return self.id in self.engine.tm.idToTransactions
+
+    def read(self, varId: int):
+        return self.engine.read(self.id, varId)
+
+    def write(self, varId: int, val: int):
+        return self.engine.write(self.id, varId, val)
+
+    def commit(self) -> bool:
+        return self.engine.end(self.id)
+
+    def abort(self) -> None:
+        self.engine.abort(self.id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        if self.live:
+            if excType is None:
+                self.commit()
+            else:
+                self.abort()
+        return False
+
+
+class _Recorder(EventSink):
+    def __init__(self, engine, sink: EventSink) -> None:
+        self.engine = engine
+        self.sink = sink
+
+    def emit(self, event: Event, *args) -> None:
+        engine = self.engine
+        if engine.current is not None and event in _RECORDED_EVENTS:
+            engine.records[engine.current].append((event, args))
+        elif (event == Event.COMMIT or event == Event.ABORT) and args[0] in engine.blocked:
+            engine._settle_transaction(args[0])
+        self.sink.emit(event, *args)
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+class Engine:
+    # db: a main.DB (or anything with sites, placement and startTime)
+    def __init__(self, db, events: EventSink = None, deadlockPolicy=None, scheduler=None,
+                 catchUpOnRecover: bool = False) -> None:
+        self.db = db
+        self.tm = TransactionManager(db.sites, db.placement, events if events is not None else EventSink(),
+                                     deadlockPolicy, scheduler, catchUpOnRecover)
+        self.clock = db.startTime
+        self.nextTrxId = 1
+        # op -> events answering it, for the operations submitted through the
+        # API that have not been answered yet
+        self.records = dict()
+        # trxId -> Blocked handles of its operations on hold
+        self.blocked = dict()
+        # tracked operation being handled
+        self.current = None
+        self.tracking = False
+
+    def _track(self):
+        # Installed on the first API call only, run() over parsed text pays
+        # nothing for it
+        if self.tracking:
+            return
+        self.tracking = True
+        tm = self.tm
+        tm.events = _Recorder(self, tm.events)
+        handle = tm._handle_operation
+        records = self.records
+
+        def tracked_handle(op):
+            previous = self.current
+            self.current = op if op in records else None
+            try:
+                handle(op)
+            finally:
+                self.current = previous
+
+        tm._handle_operation = tracked_handle
+
+    def run(self, operations=None) -> None:
+        # Text front end: runs an iterable of Operations (stdin is parsed by
+        # default) and closes the event sink
+        self.tm.start(operations)
+
+    def close(self) -> None:
+        self.tm.events.close()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        self.close()
+        return False
+
+    def begin(self, trxId: int = None) -> Txn:
+        return self._begin(trxId, Action.BEGIN)
+
+    def begin_ro(self, trxId: int = None) -> Txn:
+        return self._begin(trxId, Action.BEGIN_RO)
+
+    def _begin(self, trxId, action):
+        if trxId is None:
+            trxId = self.nextTrxId
+        elif trxId in self.tm.idToTransactions:
+            raise TransactionError(trxId, f'T{trxId} already exists')
+        self.execute(Operation(None, action, trxId))
+        return Txn(self, trxId, action == Action.BEGIN_RO)
+
+    def read(self, trxId: int, varId: int):
+        return self._unwrap(self.execute(Operation(None, Action.READ, trxId, varId)))
+
+    def write(self, trxId: int, varId: int, val: int):
+        # returns the ids of the sites written to
+        return self._unwrap(self.execute(Operation(None, Action.WRITE, trxId, varId, None, val)))
+
+    def end(self, trxId: int) -> bool:
+        # True if the transaction committed, False if it was aborted
+        return self._unwrap(self.execute(Operation(None, Action.END, trxId)))
+
+    def abort(self, trxId: int, cause: AbortCause = AbortCause.CLIENT_ABORT) -> None:
+        if trxId not in self.tm.idToTransactions:
+            raise TransactionError(trxId, f'T{trxId} is not active')
+        self.tm.abort(trxId, cause)
+        self.tm.drain()
+
+    def fail(self, siteId: int) -> None:
+        self.execute(Operation(None, Action.FAIL, site_id=siteId))
+
+    def recover(self, siteId: int) -> None:
+        self.execute(Operation(None, Action.RECOVER, site_id=siteId))
+
+    def dump(self, siteId: int = None, varId: int = None) -> dict:
+        # siteId -> {varId: committed value}, of every site or only the given
+        # site or variable
+        return self.execute(Operation(None, Action.DUMP, var_id=varId, site_id=siteId))
+
+    def dump_diff(self) -> dict:
+        # dump() of the committed values changed since the previous dump_diff()
+        return self.execute(Operation(None, Action.DUMP_DIFF))
+
+    def stats(self) -> dict:
+        return self.execute(Operation(None, Action.STATS))
+
+    def execute(self, op):
+        return self.submit((op,))[0]
+
+    def submit(self, ops) -> list:
+        # Runs a batch of instructions, Operations or tuples in the input
+        # grammar: ('R', t, x), ('W', t, x, v), ('begin', t), ('beginRO', t),
+        # ('end', t), ('fail', s), ('recover', s), ('dump',), ('stats',), and
+        # ('dump', 'xj'), ('dump', i), ('dump', 'diff').
+        # Operations woken up by one instruction run before the next one, as in
+        # a text input, and the batch ends once every woken operation has run
+        # (as after each instruction of the TCP server). Returns one outcome per
+        # instruction: the value read, the sites written, a Blocked handle,
+        # whether end() committed, the dump or stats; errors are returned as
+        # TransactionError instances, not raised.
+        self._track()
+        ops = [self._operation(op) for op in ops]
+        tm = self.tm
+        records = self.records
+        for op in ops:
+            records[op] = list()
+        for op in ops:
+            tm.step(op)
+        tm.drain()
+        return [self._outcome(op) for op in ops]
+
+    def _operation(self, spec) -> Operation:
+        if isinstance(spec, Operation):
+            op = spec
+            if op.timestamp is None:
+                op.timestamp = self.clock
+            self.clock = max(self.clock, op.timestamp + 1)
+        else:
+            name, *args = spec
+            timestamp = self.clock
+            if name == 'R' and len(args) == 2:
+                op = Operation(timestamp, Action.READ, args[0], args[1])
+            elif name == 'W' and len(args) == 3:
+                op = Operation(timestamp, Action.WRITE, args[0], args[1], None, args[2])
+            elif name in _TXN_ACTIONS and len(args) == 1:
+                op = Operation(timestamp, _TXN_ACTIONS[name], args[0])
+            elif name in _SITE_ACTIONS and len(args) == 1:
+                op = Operation(timestamp, _SITE_ACTIONS[name], site_id=args[0])
+            elif name in _NO_ARG_ACTIONS and not args:
+                op = Operation(timestamp, _NO_ARG_ACTIONS[name])
+            elif name == 'dump' and len(args) == 1:
+                op = self._dump_operation(timestamp, args[0])
+            else:
+                raise ValueError(f'unknown instruction {spec!r}')
+            self.clock += 1
+        if op.action in (Action.BEGIN, Action.BEGIN_RO) and op.txn_id >= self.nextTrxId:
+            self.nextTrxId = op.txn_id + 1
+        return op
+
+    def _dump_operation(self, timestamp, arg) -> Operation:
+        if arg == 'diff':
+            return Operation(timestamp, Action.DUMP_DIFF)
+        if isinstance(arg, str) and arg.startswith('x') and arg[1:].isdigit():
+            return Operation(timestamp, Action.DUMP, var_id=int(arg[1:]))
+        if isinstance(arg, int):
+            return Operation(timestamp, Action.DUMP, site_id=arg)
+        raise ValueError(f'unknown dump argument {arg!r}')
+
+    def _outcome(self, op):
+        if op in self.tm.waitingOperations:
+            handle = Blocked(self, op)
+            self.blocked.setdefault(op.txn_id, list()).append(handle)
+            return handle
+        return self._answer(op)
+
+    def _answer(self, op):
+        records = self.records.pop(op, ())
+        action = op.action
+        if action == Action.READ or action == Action.WRITE:
+            for event, args in reversed(records):
+                if event == Event.READ:
+                    return args[2]
+                if event == Event.WRITE:
+                    return args[3]
+                if event in _ABORTED_EVENTS:
+                    return TransactionAborted(op.txn_id, format_text(event, args))
+                if event in (Event.TXN_FINISHED, Event.UNKNOWN_TXN, Event.VALUE_OUT_OF_RANGE):
+                    return TransactionError(op.txn_id, format_text(event, args))
+            # dropped from the wait queue when its transaction ended
+            if self.tm.finishedTransactions.outcome(op.txn_id):
+                return TransactionError(op.txn_id, f'T{op.txn_id} ended before {op} could run')
+            return TransactionAborted(op.txn_id, f'T{op.txn_id} aborted while {op} was waiting')
+        if action == Action.END:
+            outcome = self.tm.finishedTransactions.outcome(op.txn_id)
+            if outcome is None:
+                return TransactionError(op.txn_id, f'T{op.txn_id} has not begun or is no longer remembered')
+            return outcome
+        if action == Action.DUMP or action == Action.DUMP_DIFF:
+            return {args[0]: dict(args[1]) for event, args in records if event == Event.DUMP_SITE}
+        if action == Action.STATS:
+            for event, args in records:
+                if event == Event.STATS:
+                    return args[0]
+        return None
+
+    def _settle(self, handle):
+        handle.outcome = self._answer(handle.op)
+        handle.settled = True
+        handles = self.blocked.get(handle.op.txn_id)
+        if handles is not None:
+            handles.remove(handle)
+            if not handles:
+                del self.blocked[handle.op.txn_id]
+
+    def _settle_transaction(self, trxId):
+        # the transaction ended, none of its operations waits any longer
+        for handle in self.blocked.pop(trxId, ()):
+            handle.outcome = self._answer(handle.op)
+            handle.settled = True
+
+    def _unwrap(self, outcome):
+        if isinstance(outcome, TransactionError):
+            raise outcome
+        return outcome
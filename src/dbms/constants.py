@@ -1,5 +1,10 @@
 from enum import Enum
 
+# values are stored as signed 64-bit integers (columnar store, log,
+# checkpoints and images)
+MIN_VALUE = -2 ** 63
+MAX_VALUE = 2 ** 63 - 1
+
 class DataType(Enum):
     NON_REPLICATED = 1
     REPLICATED = 2
@@ -13,6 +18,8 @@ class Action(Enum):
     END = 6
     FAIL = 7
     RECOVER = 8
+    STATS = 9
+    DUMP_DIFF = 10
 
 class TransactionStatus(Enum):
     ACTIVE = 1
@@ -20,3 +27,48 @@ class TransactionStatus(Enum):
     COMMITTED = 3
     ABORTED = 4
     ABORTING = 5
+
+class AbortCause(Enum):
+    DEADLOCK = 1
+    SITE_FAILURE = 2
+    NO_VALID_VERSION = 3
+    NO_AVAIL_SITE = 4
+    CLIENT_DISCONNECT = 5
+    WAIT_DIE = 6
+    WOUND_WAIT = 7
+    WAIT_TIMEOUT = 8
+    CLIENT_ABORT = 9
+
+class LockType(Enum):
+    SHARED = 1
+    EXCLUSIVE = 2
+
+class Event(Enum):
+    BEGIN = 1
+    BEGIN_RO = 2
+    RW_FAIL = 3
+    READ = 4
+    RO_READ_FAIL = 5
+    READ_FAIL = 6
+    WRITE = 7
+    WRITE_ON_HOLD = 8
+    NO_AVAIL_SITE = 9
+    WAIT_FOR_COMMIT = 10
+    ON_HOLD_WAIT = 11
+    LOCK_CONFLICT = 12
+    DEADLOCK_DETECTED = 13
+    COMMIT = 14
+    ABORT = 15
+    WAKE_UP_OP = 16
+    SITE_DOWN = 17
+    AFFECTED_TXNS = 18
+    SITE_RECOVER = 19
+    DUMP_SITE = 20
+    STATS = 21
+    WAIT_DIE = 22
+    WOUND_WAIT = 23
+    WAIT_TIMEOUT = 24
+    TXN_FINISHED = 25
+    UNKNOWN_TXN = 26
+    CATCH_UP = 27
+    VALUE_OUT_OF_RANGE = 28
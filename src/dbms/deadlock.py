@@ -0,0 +1,222 @@
+from .constants import AbortCause, Event
+
+class WaitsForGraph:
+    # Edges go from a lock holder to the transactions waiting for it, i.e.
+    # holderToWaiters[T1] = {T2} means T2 waits for T1.
+    def __init__(self) -> None:
+        self.holderToWaiters = dict()
+        self.waiterToHolders = dict()
+
+    def addEdge(self, holderId, waiterId):
+        waiters = self.holderToWaiters.get(holderId)
+        if waiters is None:
+            waiters = self.holderToWaiters[holderId] = set()
+        elif waiterId in waiters:
+            return False
+        waiters.add(waiterId)
+        self.waiterToHolders.setdefault(waiterId, set()).add(holderId)
+        return True
+
+    def hasEdge(self, holderId, waiterId):
+        return waiterId in self.holderToWaiters.get(holderId, ())
+
+    def removeNode(self, trxId):
+        for holderId in self.waiterToHolders.pop(trxId, ()):
+            waiters = self.holderToWaiters[holderId]
+            waiters.discard(trxId)
+            if not waiters:
+                del self.holderToWaiters[holderId]
+        for waiterId in self.holderToWaiters.pop(trxId, ()):
+            holders = self.waiterToHolders[waiterId]
+            holders.discard(trxId)
+            if not holders:
+                del self.waiterToHolders[waiterId]
+
+    def waitersOf(self, holderId):
+        return self.holderToWaiters.get(holderId, ())
+
+    def __contains__(self, trxId):
+        return trxId in self.holderToWaiters
+
+    def __getitem__(self, holderId):
+        return self.holderToWaiters[holderId]
+
+    def __len__(self):
+        return len(self.holderToWaiters)
+
+    def items(self):
+        return self.holderToWaiters.items()
+
+    def clear(self):
+        self.holderToWaiters.clear()
+        self.waiterToHolders.clear()
+
+
+class DeadlockDetector:
+    def __init__(self, graph: WaitsForGraph) -> None:
+        self.graph = graph
+
+    def findCycleThroughEdge(self, holderId, waiterId):
+        # A new edge holder -> waiter closes a cycle iff the holder is reachable
+        # from the waiter. Iterative DFS so that long wait chains cannot hit the
+        # recursion limit; returns the transactions on the cycle or None.
+        if not self.graph.hasEdge(holderId, waiterId):
+            return None
+        if holderId == waiterId:
+            return [holderId]
+        parent = {waiterId: None}
+        stack = [waiterId]
+        while stack:
+            currId = stack.pop()
+            for nextId in self.graph.waitersOf(currId):
+                if nextId in parent:
+                    continue
+                parent[nextId] = currId
+                if nextId == holderId:
+                    cycle = [holderId]
+                    currId = parent[holderId]
+                    while currId is not None:
+                        cycle.append(currId)
+                        currId = parent[currId]
+                    return cycle
+                stack.append(nextId)
+        return None
+
+
+# Deadlock policies. The TransactionManager reports every wait (holder, waiter)
+# with addWait while an operation is put on hold, and calls resolve once the
+# read or write has been handled, so victims are never aborted halfway through
+# queueing an operation. removeTransaction is called when a transaction ends.
+
+class CycleDetection:
+    # Waits-for graph, each new edge is searched for a cycle and the youngest
+    # transaction on it is aborted
+    name = 'detect'
+
+    def __init__(self) -> None:
+        self.graph = WaitsForGraph()
+        self.detector = DeadlockDetector(self.graph)
+        # edges added since the last check
+        self.newWaits = list()
+
+    def addWait(self, holderId, waiterId):
+        if self.graph.addEdge(holderId, waiterId):
+            self.newWaits.append((holderId, waiterId))
+
+    def hasWork(self):
+        return bool(self.newWaits)
+
+    def removeTransaction(self, trxId):
+        self.graph.removeNode(trxId)
+
+    def resolve(self, tm, timestamp=None):
+        # Every cycle must go through an edge added since the last check, so only
+        # those edges are searched. An edge can close several cycles, hence the
+        # loop until the edge is gone or no cycle goes through it anymore.
+        while self.newWaits:
+            edges = self.newWaits
+            self.newWaits = list()
+            for holderId, waiterId in edges:
+                while True:
+                    cycle = self.detector.findCycleThroughEdge(holderId, waiterId)
+                    if not cycle:
+                        break
+                    tm._abort_youngest_txn(cycle)
+
+
+class _TimestampPolicy:
+    # Wait-die and wound-wait: the start times of the two transactions decide
+    # on the spot whether the waiter may wait, no graph is kept
+    def __init__(self) -> None:
+        self.newWaits = list()
+
+    def addWait(self, holderId, waiterId):
+        self.newWaits.append((holderId, waiterId))
+
+    def hasWork(self):
+        return bool(self.newWaits)
+
+    def removeTransaction(self, trxId):
+        pass
+
+    def resolve(self, tm, timestamp=None):
+        waits = self.newWaits
+        self.newWaits = list()
+        for holderId, waiterId in waits:
+            holder = tm.idToTransactions.get(holderId)
+            waiter = tm.idToTransactions.get(waiterId)
+            if holder is None or waiter is None or not tm.isLive(holder) or not tm.isLive(waiter):
+                continue
+            self._decide(tm, holder, waiter)
+
+
+class WaitDie(_TimestampPolicy):
+    # An older transaction waits for a younger one, a younger one aborts
+    name = 'wait-die'
+
+    def _decide(self, tm, holder, waiter):
+        if waiter.start_time > holder.start_time:
+            tm.abortVictim(waiter.id, AbortCause.WAIT_DIE, Event.WAIT_DIE, waiter.id, holder.id)
+
+
+class WoundWait(_TimestampPolicy):
+    # An older transaction aborts (wounds) the younger one it would wait for,
+    # a younger one waits
+    name = 'wound-wait'
+
+    def _decide(self, tm, holder, waiter):
+        if waiter.start_time < holder.start_time:
+            tm.abortVictim(holder.id, AbortCause.WOUND_WAIT, Event.WOUND_WAIT, waiter.id, holder.id)
+
+
+class WaitTimeout:
+    # A transaction whose operation has been on hold for more than `timeout`
+    # ticks is aborted. Ticks are operation timestamps, checked after every
+    # instruction.
+    name = 'timeout'
+    DEFAULT_TIMEOUT = 50
+
+    def __init__(self, timeout: int = DEFAULT_TIMEOUT) -> None:
+        self.timeout = timeout
+        # waiter -> tick it started waiting at (None until the next check)
+        self.waitStart = dict()
+        self.now = 0
+
+    def addWait(self, holderId, waiterId):
+        self.waitStart.setdefault(waiterId, None)
+
+    def hasWork(self):
+        return bool(self.waitStart)
+
+    def removeTransaction(self, trxId):
+        self.waitStart.pop(trxId, None)
+
+    def resolve(self, tm, timestamp=None):
+        if timestamp is not None and timestamp > self.now:
+            self.now = timestamp
+        timedOut = list()
+        for waiterId, start in list(self.waitStart.items()):
+            if not tm.waitingOperations.hasOpsOf(waiterId):
+                # its operation ran
+                del self.waitStart[waiterId]
+            elif start is None:
+                self.waitStart[waiterId] = self.now
+            elif self.now - start > self.timeout:
+                timedOut.append(waiterId)
+        for waiterId in timedOut:
+            if waiterId in self.waitStart:
+                tm.abortVictim(waiterId, AbortCause.WAIT_TIMEOUT, Event.WAIT_TIMEOUT, waiterId, self.timeout)
+
+
+DEADLOCK_POLICIES = {
+    CycleDetection.name: CycleDetection,
+    WaitDie.name: WaitDie,
+    WoundWait.name: WoundWait,
+    WaitTimeout.name: WaitTimeout,
+}
+
+
+def make_deadlock_policy(name: str = CycleDetection.name, timeout: int = None):
+    if name == WaitTimeout.name and timeout is not None:
+        return WaitTimeout(timeout)
+    return DEADLOCK_POLICIES[name]()
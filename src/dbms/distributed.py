@@ -0,0 +1,239 @@
+import multiprocessing
+import pickle
+import threading
+
+from .site import Site
+
+# Distributed mode: every site runs in its own worker process and the
+# TransactionManager talks to it through a RemoteSite proxy over a pipe.
+# Requests sent to several sites through call_sites are all written before any
+# reply is read, so the workers handle them in parallel.
+#
+# A failure stops the worker. Its state (the site's stable storage) is handed
+# back to the coordinator, which serves the few calls made on a down site, and
+# a new worker is started from it when the site recovers.
+
+_STOP = '__stop__'
+_LOCK_MANAGER = 'lock_manager.'
+
+
+def _resolve(site, method):
+    if method == 'lock_manager.contains':
+        return lambda name, varId: varId in getattr(site.lock_manager, name)
+    if method.startswith(_LOCK_MANAGER):
+        return getattr(site.lock_manager, method[len(_LOCK_MANAGER):])
+    return getattr(site, method)
+
+
+def site_worker(conn, site):
+    # the proxy keeps the site's up flag in the coordinator's placement, the
+    # worker's site needs none (a forked worker would keep every other site)
+    site.placement = None
+    while True:
+        try:
+            method, args = conn.recv()
+        except EOFError:
+            return
+        if method == _STOP:
+            conn.send(site)
+            conn.close()
+            return
+        try:
+            conn.send((True, _resolve(site, method)(*args)))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class RemoteVarSet:
+    # Membership tests on a variable set of the worker's lock manager
+    def __init__(self, site, name: str) -> None:
+        self.site = site
+        self.name = name
+
+    def __contains__(self, varId):
+        return self.site.call('lock_manager.contains', self.name, varId)
+
+
+class RemoteLockManager:
+    def __init__(self, site) -> None:
+        self.site = site
+        self.varsWaitingForCommittedWrites = RemoteVarSet(site, 'varsWaitingForCommittedWrites')
+
+    def canRead(self, varId, trxId):
+        return self.site.call('lock_manager.canRead', varId, trxId)
+
+    def canWrite(self, varId, trxId):
+        return self.site.call('lock_manager.canWrite', varId, trxId)
+
+    def addReadLock(self, varId, trxId):
+        return self.site.call('lock_manager.addReadLock', varId, trxId)
+
+    def addWriteLock(self, varId, trxId):
+        return self.site.call('lock_manager.addWriteLock', varId, trxId)
+
+    def getLockType(self, varId, trxId):
+        return self.site.call('lock_manager.getLockType', varId, trxId)
+
+    def getLockHolders(self, varId):
+        return self.site.call('lock_manager.getLockHolders', varId)
+
+
+class RemoteSite:
+    isRemote = True
+
+    def __init__(self, site: Site) -> None:
+        self.id = site.id
+        self.placement = None
+        self.storage = None
+        self.lock_manager = RemoteLockManager(self)
+        # state of the site while it is down and its worker is stopped
+        self.local = None
+        self.process = None
+        self.conn = None
+        self.result = None
+        # one request on the pipe at a time when several threads use the proxy
+        self.lock = threading.Lock()
+        if site.is_down:
+            # restored from an image while down, started by recover(); a copy
+            # without the placement, as a stopped worker sends back
+            self.local = pickle.loads(pickle.dumps(site))
+        else:
+            self._start(site)
+
+    @property
+    def is_down(self):
+        return self.local is not None
+
+    def _start(self, site):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=site_worker, args=(child, site), name=f'site{site.id}',
+                                               daemon=True)
+        self.process.start()
+        child.close()
+        self.local = None
+
+    def _stop(self):
+        self.conn.send((_STOP, ()))
+        site = self.conn.recv()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+        return site
+
+    def sendCall(self, method: str, *args):
+        if self.local is not None:
+            self.result = (True, _resolve(self.local, method)(*args))
+        else:
+            self.conn.send((method, args))
+
+    def receiveResult(self):
+        if self.local is not None:
+            ok, result = self.result
+            self.result = None
+        else:
+            ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, method: str, *args):
+        with self.lock:
+            self.sendCall(method, *args)
+            return self.receiveResult()
+
+    def attachPlacement(self, placement):
+        self.placement = placement
+        placement.setUp(self.id, self.local is None)
+
+    def registerVar(self, varId, datatype):
+        return self.call('registerVar', varId, datatype)
+
+    def lastCommitTime(self):
+        return self.call('lastCommitTime')
+
+    def readValue(self, varId, trxId):
+        return self.call('readValue', varId, trxId)
+
+    def writeValue(self, varId, writeToVal, trxId):
+        return self.call('writeValue', varId, writeToVal, trxId)
+
+    def commitValue(self, txn_id, currTime, gcHorizon=None):
+        return self.call('commitValue', txn_id, currTime, gcHorizon)
+
+    def getLockedVariables(self, trxId):
+        return self.call('getLockedVariables', trxId)
+
+    def releaseAllLocks(self, trxId):
+        return self.call('releaseAllLocks', trxId)
+
+    def addWriteLock(self, varId, trxId):
+        return self.call('addWriteLock', varId, trxId)
+
+    def revertValue(self, trxId):
+        return self.call('revertValue', trxId)
+
+    def readVersion(self, varId, timestamp):
+        return self.call('readVersion', varId, timestamp)
+
+    def committedValues(self):
+        return self.call('committedValues')
+
+    def committedValue(self, varId):
+        return self.call('committedValue', varId)
+
+    def takeChangedValues(self):
+        return self.call('takeChangedValues')
+
+    def collectVersions(self, gcHorizon=None):
+        return self.call('collectVersions', gcHorizon)
+
+    def varsWaitingForCommittedWrites(self):
+        return self.call('varsWaitingForCommittedWrites')
+
+    def exportCommitted(self, varIds):
+        return self.call('exportCommitted', varIds)
+
+    def installCommitted(self, varIds, times, vals):
+        return self.call('installCommitted', varIds, times, vals)
+
+    def stats(self):
+        return self.call('stats')
+
+    def exportImage(self):
+        return self.call('exportImage')
+
+    def enableLockStriping(self, numOfStripes):
+        # the worker handles one request at a time, its lock table is not shared
+        pass
+
+    def compactFailureHistory(self, horizon=None):
+        return self.call('compactFailureHistory', horizon)
+
+    def isSiteFailInPeriod(self, startTime, endTime):
+        return self.call('isSiteFailInPeriod', startTime, endTime)
+
+    def wasUpAt(self, timestamp):
+        return self.call('wasUpAt', timestamp)
+
+    def forgetTransactions(self, trxIds):
+        return self.call('forgetTransactions', trxIds)
+
+    def fail(self, timestamp):
+        if self.placement is not None:
+            self.placement.setUp(self.id, False)
+        visitedTrxIds = self.call('fail', timestamp)
+        if self.local is None:
+            self.local = self._stop()
+        return visitedTrxIds
+
+    def recover(self, timestamp):
+        if self.local is not None:
+            self._start(self.local)
+        if self.placement is not None:
+            self.placement.setUp(self.id, True)
+        return self.call('recover', timestamp)
+
+    def close(self):
+        if self.local is None:
+            self.local = self._stop()
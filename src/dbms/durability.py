@@ -0,0 +1,190 @@
+import mmap
+import os
+import struct
+import zlib
+from array import array
+
+# Write-ahead log of committed writes plus compact checkpoints, one pair of
+# files per site:
+#   site<id>.wal   append-only, memory-mapped log of fixed size records
+#   site<id>.ckpt  columnar snapshot of the version chains, replaced atomically
+# A site is restored from its checkpoint plus the log tail written after it.
+
+class WriteAheadLog:
+    # crc32, kind, site id, var id, commit time, value
+    RECORD = struct.Struct('<IHHIqq')
+    WRITE = 1
+    COMMIT = 2
+    SEGMENT_SIZE = 1 << 20
+    # largest ids the record fields hold (values are checked by the
+    # TransactionManager, see constants.MAX_VALUE)
+    MAX_SITE_ID = 0xFFFF
+    MAX_VAR_ID = 0xFFFFFFFF
+
+    @classmethod
+    def checkLimits(cls, numOfSites: int, numOfVars: int) -> None:
+        # Raises ValueError for a configuration the records cannot describe,
+        # before anything is committed in memory but missing from the log
+        if numOfSites > cls.MAX_SITE_ID:
+            raise ValueError(f'a data directory supports at most {cls.MAX_SITE_ID} sites, not {numOfSites}')
+        if numOfVars > cls.MAX_VAR_ID:
+            raise ValueError(f'a data directory supports at most {cls.MAX_VAR_ID} variables, not {numOfVars}')
+
+    def __init__(self, path: str, groupSize: int = 32) -> None:
+        self.path = path
+        # number of commits written between two flushes of the mapping
+        self.groupSize = groupSize
+        self.pendingCommits = 0
+        exists = os.path.exists(path)
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            size = self.SEGMENT_SIZE
+            self.file.truncate(size)
+        self.mm = mmap.mmap(self.file.fileno(), size)
+        self.offset = self._find_end()
+
+    def appendCommit(self, siteId: int, commitTime: int, writes) -> None:
+        for varId, value in writes:
+            self._append(self.WRITE, siteId, varId, commitTime, value)
+        self._append(self.COMMIT, siteId, 0, commitTime, 0)
+        self.pendingCommits += 1
+        if self.pendingCommits >= self.groupSize:
+            self.flush()
+
+    def replay(self):
+        # Yields (commit time, [(varId, value)]) for every complete commit
+        writes = list()
+        for kind, _siteId, varId, commitTime, value in self._records():
+            if kind == self.WRITE:
+                writes.append((varId, value))
+            elif kind == self.COMMIT:
+                yield commitTime, writes
+                writes = list()
+
+    def reset(self) -> None:
+        # Called once a checkpoint covers every record in the log
+        self.mm[:self.offset] = bytes(self.offset)
+        self.offset = 0
+        self.flush()
+
+    def flush(self) -> None:
+        self.mm.flush()
+        self.pendingCommits = 0
+
+    def close(self) -> None:
+        if self.mm.closed:
+            return
+        self.flush()
+        self.mm.close()
+        self.file.close()
+
+    def _append(self, kind, siteId, varId, commitTime, value):
+        size = self.RECORD.size
+        if self.offset + size > len(self.mm):
+            self._grow()
+        payload = self.RECORD.pack(0, kind, siteId, varId, commitTime, value)[4:]
+        self.mm[self.offset:self.offset + size] = struct.pack('<I', zlib.crc32(payload)) + payload
+        self.offset += size
+
+    def _grow(self):
+        self.mm.flush()
+        self.mm.close()
+        newSize = os.fstat(self.file.fileno()).st_size + self.SEGMENT_SIZE
+        self.file.truncate(newSize)
+        self.mm = mmap.mmap(self.file.fileno(), newSize)
+
+    def _records(self):
+        size = self.RECORD.size
+        offset = 0
+        while offset + size <= len(self.mm):
+            record = self.mm[offset:offset + size]
+            crc = struct.unpack_from('<I', record)[0]
+            # zero filled space or a torn record ends the log
+            if crc == 0 and record == bytes(size) or crc != zlib.crc32(record[4:]):
+                return
+            yield self.RECORD.unpack(record)[1:]
+            offset += size
+
+    def _find_end(self):
+        count = 0
+        for _ in self._records():
+            count += 1
+        return count * self.RECORD.size
+
+
+class Checkpoint:
+    # header, then the version columns: var ids, versions per var, commit times
+    # and values of every chain (oldest first)
+    HEADER = struct.Struct('<4sIII')
+    MAGIC = b'RCK2'
+
+    @classmethod
+    def write(cls, path: str, siteId: int, varIds, counts, times, vals) -> None:
+        chunks = [cls.HEADER.pack(cls.MAGIC, siteId, len(varIds), len(times)),
+                  array('I', varIds).tobytes(), array('I', counts).tobytes(),
+                  array('q', times).tobytes(), array('q', vals).tobytes()]
+        tmpPath = path + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(b''.join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, path)
+
+    @classmethod
+    def read(cls, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, _siteId, numOfVars, numOfVersions = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError(f'{path} is not a checkpoint file')
+        offset = cls.HEADER.size
+        columns = list()
+        for typecode, length in (('I', numOfVars), ('I', numOfVars), ('q', numOfVersions), ('q', numOfVersions)):
+            column = array(typecode)
+            end = offset + column.itemsize * length
+            column.frombytes(data[offset:end])
+            offset = end
+            columns.append(column)
+        return tuple(columns)
+
+
+class SiteStorage:
+    def __init__(self, dataDir: str, siteId: int, groupSize: int = 32, checkpointEvery: int = 1024) -> None:
+        os.makedirs(dataDir, exist_ok=True)
+        self.siteId = siteId
+        self.checkpointPath = os.path.join(dataDir, f'site{siteId}.ckpt')
+        self.wal = WriteAheadLog(os.path.join(dataDir, f'site{siteId}.wal'), groupSize)
+        # number of commits logged after which a new checkpoint is taken
+        self.checkpointEvery = checkpointEvery
+        self.commitsSinceCheckpoint = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.checkpointPath)
+
+    def logCommit(self, commitTime: int, writes) -> None:
+        self.wal.appendCommit(self.siteId, commitTime, writes)
+        self.commitsSinceCheckpoint += 1
+
+    def shouldCheckpoint(self) -> bool:
+        return self.commitsSinceCheckpoint >= self.checkpointEvery
+
+    def checkpoint(self, columns) -> None:
+        Checkpoint.write(self.checkpointPath, self.siteId, *columns)
+        self.wal.reset()
+        self.commitsSinceCheckpoint = 0
+
+    def readCheckpoint(self):
+        return Checkpoint.read(self.checkpointPath)
+
+    def replayLog(self):
+        # Commits logged after the latest checkpoint, as (commit time, writes). A
+        # record already covered by the checkpoint (crash between checkpoint and
+        # log reset) is skipped by the store by its commit time.
+        return self.wal.replay()
+
+    def flush(self) -> None:
+        self.wal.flush()
+
+    def close(self) -> None:
+        self.wal.close()
@@ -0,0 +1,146 @@
+import json
+from collections import Counter
+
+from .constants import Event
+from .input_parser import Operation
+
+# Event -> (text template, field names). Arguments are kept as emitted and only
+# turned into text (or JSON) when a sink writes them out.
+EVENT_FORMATS = {
+    Event.BEGIN: ('[INFO] T{} begins', ('txn',)),
+    Event.BEGIN_RO: ('[INFO] T{} begins as a read-only transaction', ('txn',)),
+    Event.RW_FAIL: ('[RW_FAIL] T{} can\'t be executed because it is aborted or will be aborted', ('txn',)),
+    Event.READ: ('[INFO] T{} reads x{}: {}', ('txn', 'var', 'value')),
+    Event.RO_READ_FAIL: ('[INFO] T{} can\'t read x{} because no valid version is available', ('txn', 'var')),
+    Event.READ_FAIL: ('[READ_FAIL] T{} can\'t read x{} because all sites holding the variable are down', ('txn', 'var')),
+    Event.WRITE: ('[INFO] T{} writes x{}: {} to site(s): {}', ('txn', 'var', 'value', 'sites')),
+    Event.WRITE_ON_HOLD: ('[WRITE_ON_HOLD] {}', ('op',)),
+    Event.NO_AVAIL_SITE: ('[NO_AVAIL_SITE] T{} waits because all sites holding the variable are down', ('txn',)),
+    Event.WAIT_FOR_COMMIT: ('[WAIT_FOR_COMMIT] T{} waits because x{} is waiting for committed write at site {}', ('txn', 'var', 'site')),
+    Event.ON_HOLD_WAIT: ('[ON_HOLD_WAIT] T{} waits because it cannot skip T{}', ('txn', 'waits_for')),
+    Event.LOCK_CONFLICT: ('[LOCK_CONFLICT] T{} waits for T{}', ('txn', 'waits_for')),
+    Event.DEADLOCK_DETECTED: ('[DEADLOCK_DETECTED] kill youngest transaction T{}', ('txn',)),
+    Event.COMMIT: ('[INFO] T{} commits', ('txn',)),
+    Event.ABORT: ('[INFO] T{} aborts', ('txn',)),
+    Event.WAKE_UP_OP: ('[WAKE_UP_OP] {}', ('op',)),
+    Event.SITE_DOWN: ('[INFO] Site {} is down', ('site',)),
+    Event.AFFECTED_TXNS: ('[AFFECTED_TXNS] T{} should abort', ('txns',)),
+    Event.SITE_RECOVER: ('[INFO] Site {} recovers', ('site',)),
+    Event.DUMP_SITE: ('site {} - {}', ('site', 'values')),
+    Event.STATS: ('[STATS] {}', ('stats',)),
+    Event.WAIT_DIE: ('[WAIT_DIE] T{} dies instead of waiting for older T{}', ('txn', 'waits_for')),
+    Event.WOUND_WAIT: ('[WOUND_WAIT] T{} wounds younger T{}', ('txn', 'wounded')),
+    Event.WAIT_TIMEOUT: ('[WAIT_TIMEOUT] T{} waited more than {} ticks', ('txn', 'timeout')),
+    Event.TXN_FINISHED: ('[TXN_FINISHED] T{} has already committed', ('txn',)),
+    Event.CATCH_UP: ('[CATCH_UP] Site {} copied {} committed variable(s) from site(s): {}', ('site', 'vars', 'sites')),
+    Event.UNKNOWN_TXN: ('[UNKNOWN_TXN] T{} has not begun or is no longer remembered', ('txn',)),
+    Event.VALUE_OUT_OF_RANGE: ('[WRITE_FAIL] T{} can\'t write x{}: {} is not a signed 64-bit integer', ('txn', 'var', 'value')),
+}
+
+def format_text(event, args):
+    if event == Event.WRITE:
+        txnId, varId, val, siteIds = args
+        args = (txnId, varId, val, ' '.join(str(siteId) for siteId in siteIds))
+    elif event == Event.DUMP_SITE:
+        siteId, values = args
+        args = (siteId, ', '.join(f'x{varId}: {val}' for varId, val in values))
+    elif event == Event.CATCH_UP:
+        siteId, numOfVars, peerIds = args
+        args = (siteId, numOfVars, ' '.join(str(peerId) for peerId in peerIds))
+    elif event == Event.STATS:
+        args = (json.dumps(args[0], sort_keys=True, separators=(',', ':')),)
+    return EVENT_FORMATS[event][0].format(*args)
+
+def _to_json_value(val):
+    if isinstance(val, (set, frozenset)):
+        return sorted(val)
+    if isinstance(val, (list, tuple)):
+        return [_to_json_value(v) for v in val]
+    if isinstance(val, Operation):
+        ret = {'time': val.timestamp, 'action': val.action.name if val.action else None}
+        for name in ('txn_id', 'var_id', 'site_id', 'var_val'):
+            if getattr(val, name) is not None:
+                ret[name] = getattr(val, name)
+        return ret
+    return val
+
+def format_json(event, args):
+    record = {'event': event.name.lower()}
+    for name, val in zip(EVENT_FORMATS[event][1], args):
+        record[name] = _to_json_value(val)
+    return json.dumps(record, separators=(',', ':'))
+
+
+class EventSink:
+    def emit(self, event: Event, *args) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class BufferedSink(EventSink):
+    BUFFER_SIZE = 4096
+
+    def __init__(self, stream, autoflush: bool = False) -> None:
+        self.stream = stream
+        self.buffer = list()
+        # write out every event right away (e.g. interactive sessions)
+        self.autoflush = autoflush
+
+    def emit(self, event: Event, *args) -> None:
+        self.buffer.append((event, args))
+        if self.autoflush or len(self.buffer) >= self.BUFFER_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        buffer = self.buffer
+        self.buffer = list()
+        self.stream.write(''.join(self.format(event, args) + '\n' for event, args in buffer))
+        self.stream.flush()
+
+    def format(self, event, args) -> str:
+        raise NotImplementedError
+
+
+class TextSink(BufferedSink):
+    def format(self, event, args) -> str:
+        return format_text(event, args)
+
+
+class JsonLinesSink(BufferedSink):
+    def format(self, event, args) -> str:
+        return format_json(event, args)
+
+
+class CounterSink(EventSink):
+    # Only counts events; writes the counts as one JSON object on close if a
+    # stream is given.
+    def __init__(self, stream=None) -> None:
+        self.stream = stream
+        self.counts = Counter()
+
+    def emit(self, event: Event, *args) -> None:
+        self.counts[event] += 1
+
+    def close(self) -> None:
+        if self.stream is not None:
+            self.stream.write(json.dumps({e.name.lower(): n for e, n in self.counts.items()}) + '\n')
+            self.stream.flush()
+
+
+def make_sink(mode: str, stream):
+    if mode == 'text':
+        return TextSink(stream, autoflush=stream.isatty())
+    if mode == 'jsonl':
+        return JsonLinesSink(stream, autoflush=stream.isatty())
+    if mode == 'counters':
+        return CounterSink(stream)
+    if mode == 'silent':
+        return EventSink()
+    raise ValueError(f'unknown output mode {mode}')
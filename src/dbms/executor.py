@@ -0,0 +1,168 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .constants import Action, TransactionStatus
+from .events import EventSink
+from .input_parser import Parser
+from .site import pooled_call_sites
+
+# Optional multi-threaded front of a TransactionManager. Consecutive reads and
+# writes of distinct transactions on distinct variables form a wave: whether
+# each of them can run without waiting is checked in a thread pool against the
+# state before the wave (in the pool if the sites are remote), and the leading
+# operations that can are then executed concurrently. They take no lock another
+# operation of the wave needs, wake up nothing and add no wait, so running them
+# in any order leaves the state of the sequential run; their events are
+# buffered per operation and emitted in input order. The rest of the wave, and every other instruction, runs on the
+# calling thread as in TransactionManager.start, so the output is the same as
+# with one thread.
+#
+# Waits-for edges, the wait queue and aborts are only touched on the calling
+# thread. The lock tables of local sites are shared by the pool and become
+# StripedLockManagers; the per-site work of a commit or an abort runs in a
+# second pool, one task per site, when the sites are durable (or the
+# interpreter has no GIL).
+
+class _WaveSink(EventSink):
+    # Events of the operation handled by the current thread
+    def __init__(self) -> None:
+        self.local = threading.local()
+
+    def emit(self, event, *args) -> None:
+        self.local.buffer.append((event, args))
+
+
+class ParallelExecutor:
+    MAX_WAVE = 256
+    NUM_OF_STRIPES = 64
+    # per-site work of commit_or_abort
+    POOLED_SITE_METHODS = frozenset(('commitValue', 'revertValue', 'releaseAllLocks'))
+
+    def __init__(self, tm, numOfThreads: int = 4, maxWave: int = MAX_WAVE) -> None:
+        self.tm = tm
+        self.numOfThreads = numOfThreads
+        self.maxWave = maxWave
+        self.sink = _WaveSink()
+        self.pool = ThreadPoolExecutor(numOfThreads, thread_name_prefix='op')
+        self.sitePool = None
+        # number of waves and of operations executed by the pool
+        self.waves = 0
+        self.parallelOps = 0
+        # operations are timed or profiled one at a time by wrappers of
+        # _handle_operation (metrics, profiler, API), which waves would bypass
+        self.enabled = numOfThreads > 1 and '_handle_operation' not in vars(tm)
+        sites = tm.idToSites.values()
+        # the checks of a wave are requests to the sites' processes
+        self.remote = any(site.isRemote for site in sites)
+        if self.enabled:
+            for site in sites:
+                site.enableLockStriping(self.NUM_OF_STRIPES)
+            # remote sites already work on fanned out requests concurrently;
+            # with the GIL only the log and checkpoint I/O of durable sites
+            # gains from running per site on threads
+            freeThreaded = not getattr(sys, '_is_gil_enabled', lambda: True)()
+            if not self.remote and (freeThreaded or any(site.storage is not None for site in sites)):
+                self.sitePool = ThreadPoolExecutor(numOfThreads, thread_name_prefix='site')
+                tm.call_sites = pooled_call_sites(self.sitePool, self.POOLED_SITE_METHODS)
+
+    def run(self, operations=None) -> None:
+        if operations is None:
+            operations = Parser()
+        tm = self.tm
+        wave = list()
+        waveTrxIds = set()
+        waveVarIds = set()
+        try:
+            for op in operations:
+                if op.action != Action.READ and op.action != Action.WRITE:
+                    if wave:
+                        self._run_wave(wave)
+                        wave = list()
+                        waveTrxIds.clear()
+                        waveVarIds.clear()
+                    tm.step(op)
+                    continue
+                if op.txn_id in waveTrxIds or op.var_id in waveVarIds or len(wave) >= self.maxWave:
+                    self._run_wave(wave)
+                    wave = list()
+                    waveTrxIds.clear()
+                    waveVarIds.clear()
+                wave.append(op)
+                waveTrxIds.add(op.txn_id)
+                waveVarIds.add(op.var_id)
+            if wave:
+                self._run_wave(wave)
+            tm._run_pending_operations()
+        finally:
+            tm.events.close()
+            self.close()
+
+    def close(self) -> None:
+        self.pool.shutdown()
+        if self.sitePool is not None:
+            self.sitePool.shutdown()
+
+    def _run_wave(self, wave):
+        tm = self.tm
+        if not self.enabled or len(wave) == 1:
+            for op in wave:
+                tm.step(op)
+            return
+        # what tm.step(wave[0]) does before handling the operation
+        tm._run_pending_operations()
+        numOfReady = 0
+        if not (tm.pending_operations or tm.scheduler.hasWork() or tm.deadlockPolicy.hasWork()):
+            checks = self._map(self._can_run, wave) if self.remote else map(self._can_run, wave)
+            for canRun in checks:
+                if not canRun:
+                    break
+                numOfReady += 1
+        if numOfReady > 1:
+            self._execute(wave[:numOfReady])
+        else:
+            tm._handle_operation(wave[0])
+            numOfReady = 1
+        for op in wave[numOfReady:]:
+            tm.step(op)
+
+    def _map(self, fn, ops):
+        # One task per thread on a contiguous slice of the operations, results
+        # in the order of ops
+        chunkSize = -(-len(ops) // self.numOfThreads)
+        chunks = [ops[i:i + chunkSize] for i in range(0, len(ops), chunkSize)]
+        results = list()
+        for chunkResults in self.pool.map(lambda chunk: [fn(op) for op in chunk], chunks):
+            results.extend(chunkResults)
+        return results
+
+    def _can_run(self, op):
+        # True if the operation would run now without waiting or aborting
+        tm = self.tm
+        trx = tm.idToTransactions.get(op.txn_id)
+        if trx is None or trx.status != TransactionStatus.ACTIVE:
+            return False
+        if trx.is_read_only:
+            return op.action == Action.READ and tm._read_version(op.var_id, trx.start_time)[0]
+        if op.action == Action.READ:
+            return tm.canRead(op.var_id, op.txn_id)
+        return tm.canWrite(op.var_id, op.txn_id)
+
+    def _execute(self, ops):
+        tm = self.tm
+        events = tm.events
+        tm.events = self.sink
+        try:
+            buffers = self._map(self._handle, ops)
+        finally:
+            tm.events = events
+        for buffer in buffers:
+            for event, args in buffer:
+                events.emit(event, *args)
+        self.waves += 1
+        self.parallelOps += len(ops)
+
+    def _handle(self, op):
+        buffer = self.sink.local.buffer = list()
+        self.tm.readOrWrite(op)
+        return buffer
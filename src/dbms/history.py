@@ -0,0 +1,51 @@
+from collections import OrderedDict
+
+# Outcome of finished transactions. The TransactionManager only keeps live
+# transactions; once one commits or aborts, its id and outcome move here so late
+# instructions naming it can still be answered. The oldest entries are dropped
+# beyond `capacity`, so memory does not grow with the length of the run.
+
+class TransactionHistory:
+    DEFAULT_CAPACITY = 1 << 16
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = capacity
+        # trxId -> True if committed, False if aborted, in the order they finished
+        self.outcomes = OrderedDict()
+        self.numOfCommitted = 0
+        self.numOfAborted = 0
+        self.numOfForgotten = 0
+
+    def record(self, trxId: int, committed: bool) -> None:
+        self.outcomes[trxId] = committed
+        self.outcomes.move_to_end(trxId)
+        if committed:
+            self.numOfCommitted += 1
+        else:
+            self.numOfAborted += 1
+        while len(self.outcomes) > self.capacity:
+            self.outcomes.popitem(last=False)
+            self.numOfForgotten += 1
+
+    def outcome(self, trxId: int):
+        # True (committed), False (aborted) or None if unknown or forgotten
+        return self.outcomes.get(trxId)
+
+    def discard(self, trxId: int) -> None:
+        # the id is reused by a new transaction
+        self.outcomes.pop(trxId, None)
+
+    def __contains__(self, trxId):
+        return trxId in self.outcomes
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def stats(self) -> dict:
+        return {
+            'committed': self.numOfCommitted,
+            'aborted': self.numOfAborted,
+            'remembered': len(self.outcomes),
+            'forgotten': self.numOfForgotten,
+            'capacity': self.capacity,
+        }
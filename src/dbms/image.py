@@ -0,0 +1,135 @@
+import gc
+import mmap
+import os
+import struct
+from array import array
+
+from .placement import Placement
+from .site import Site
+from .utils import FailureHistory
+
+# Binary image of a database: the placement of the variables and, for every
+# site, its committed versions (the checkpoint columns), failure history and
+# the replicated variables it is waiting for a committed write on. Building
+# the sites from an image replaces the per-variable, per-site initialisation
+# with bulk loads of columns. It is a fast-load format: the file is only
+# memory-mapped while the sites are built, every column is copied into the
+# site stores and nothing stays mapped once the DB is up.
+#
+#   header   magic, number of sites, number of variables, start time
+#   siteOf   uint16 per variable id (index 0 unused): the only site holding a
+#            non-replicated variable, 0 for a replicated one
+#   sites    per site: down flag, column lengths and offset of its columns
+#   columns  failure starts and ends (-1: still down), waiting var ids, then
+#            var ids, versions per var, commit times and values
+# Every column starts at a multiple of 8 bytes.
+
+_HEADER = struct.Struct('<4sIIq')
+_SITE = struct.Struct('<IIIIIIQ')
+_MAGIC = b'RCI1'
+_OPEN_END = -1
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class DatabaseImage:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        magic, self.numOfSites, self.numOfVars, self.startTime = _HEADER.unpack_from(self.mm)
+        if magic != _MAGIC:
+            self.view.release()
+            self.mm.close()
+            raise ValueError(f'{path} is not a database image')
+        offset = _align(_HEADER.size)
+        # read-only view, valid until close()
+        self.siteOf = self.view[offset:offset + 2 * (self.numOfVars + 1)].cast('H')
+        self.siteTableOffset = _align(offset + 2 * (self.numOfVars + 1))
+
+    @staticmethod
+    def save(path: str, numOfSites: int, numOfVars: int, startTime: int, placement, sites) -> None:
+        # sites: every site in id order (local or remote)
+        siteOf = array('H', bytes(2 * (numOfVars + 1)))
+        for varId in range(1, numOfVars + 1):
+            if not placement.isReplicated(varId):
+                siteOf[varId] = placement.sitesHolding(varId)[0].id
+
+        header = _HEADER.pack(_MAGIC, numOfSites, numOfVars, startTime)
+        offset = _align(_align(len(header)) + len(siteOf) * siteOf.itemsize) + _SITE.size * numOfSites
+        siteEntries = list()
+        columnChunks = list()
+        for site in sites:
+            isDown, starts, ends, waiting, varIds, counts, times, vals = site.exportImage()
+            starts = array('q', starts)
+            ends = array('q', [end if end != FailureHistory.OPEN_END else _OPEN_END for end in ends])
+            waiting = array('I', waiting)
+            offset = _align(offset)
+            siteEntries.append(_SITE.pack(site.id, isDown, len(starts), len(waiting), len(varIds), len(times),
+                                          offset))
+            for column in (starts, ends, waiting, varIds, counts, times, vals):
+                data = column.tobytes()
+                padding = _align(offset) - offset
+                columnChunks.append(bytes(padding) + data)
+                offset += padding + len(data)
+
+        chunks = [header, bytes(_align(len(header)) - len(header)), siteOf.tobytes()]
+        end = _align(len(header)) + len(chunks[2])
+        chunks.append(bytes(_align(end) - end))
+        chunks.extend(siteEntries)
+        chunks.extend(columnChunks)
+        tmpPath = path + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(b''.join(chunks))
+        os.replace(tmpPath, path)
+
+    def buildSites(self, storeClass):
+        # Returns (idToSites, placement) in the saved state. The loads allocate
+        # millions of containers and free none, collections triggered meanwhile
+        # would only traverse them again and again.
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._buildSites(storeClass)
+        finally:
+            if gcEnabled:
+                gc.enable()
+
+    def _buildSites(self, storeClass):
+        siteOf = self.siteOf
+        idToSites = dict()
+        images = list()
+        for i in range(self.numOfSites):
+            siteId, isDown, numOfFailures, numOfWaiting, numOfVars, numOfVersions, offset = _SITE.unpack_from(
+                self.mm, self.siteTableOffset + i * _SITE.size)
+            columns = list()
+            for typecode, length in (('q', numOfFailures), ('q', numOfFailures), ('I', numOfWaiting),
+                                     ('I', numOfVars), ('I', numOfVars), ('q', numOfVersions),
+                                     ('q', numOfVersions)):
+                offset = _align(offset)
+                column = array(typecode)
+                end = offset + column.itemsize * length
+                column.frombytes(self.view[offset:end])
+                offset = end
+                columns.append(column)
+            idToSites[siteId] = Site(siteId, storeClass())
+            images.append((siteId, bool(isDown), columns))
+
+        placement = Placement.fromSiteColumn(siteOf, idToSites)
+        for siteId, isDown, (starts, ends, waiting, varIds, counts, times, vals) in images:
+            replicatedVarIds = {varId for varId in varIds if siteOf[varId] == 0}
+            ends = [end if end != _OPEN_END else FailureHistory.OPEN_END for end in ends]
+            idToSites[siteId].loadImage(isDown, starts, ends, waiting, replicatedVarIds,
+                                        (varIds, counts, times, vals))
+            idToSites[siteId].attachPlacement(placement)
+        return idToSites, placement
+
+    def close(self) -> None:
+        if self.mm.closed:
+            return
+        self.siteOf.release()
+        self.view.release()
+        self.mm.close()
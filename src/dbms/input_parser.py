@@ -1,16 +1,30 @@
-from collections import deque
+import mmap
 import re
+import sys
 
 from .constants import Action
 
+_SPLIT_PATTERN = re.compile(r'[(),]')
+_DIGIT_PATTERN = re.compile(r'\d')
+# Fast path for well-formed instructions: action name and up to three numeric
+# arguments (the digits following any prefix such as T or x).
+_LINE_PATTERN = re.compile(
+    r'\s*(\w+)\s*\(\s*(?:[^\d,()]*(\d+)\s*(?:,\s*[^\d,()]*(\d+)\s*(?:,\s*[^\d,()]*(\d+)\s*)?)?)?\)')
+
+_TXN_ACTIONS = {'begin': Action.BEGIN, 'beginRO': Action.BEGIN_RO, 'end': Action.END}
+_SITE_ACTIONS = {'fail': Action.FAIL, 'recover': Action.RECOVER}
+_NO_ARG_ACTIONS = {'dump': Action.DUMP, 'stats': Action.STATS}
+
 class Operation:
-    def __init__(self) -> None:
-        self.timestamp = None
-        self.action = None
-        self.txn_id = None
-        self.var_id = None
-        self.site_id = None
-        self.var_val = None
+    __slots__ = ('timestamp', 'action', 'txn_id', 'var_id', 'site_id', 'var_val')
+
+    def __init__(self, timestamp=None, action=None, txn_id=None, var_id=None, site_id=None, var_val=None) -> None:
+        self.timestamp = timestamp
+        self.action = action
+        self.txn_id = txn_id
+        self.var_id = var_id
+        self.site_id = site_id
+        self.var_val = var_val
 
     def __repr__(self) -> str:
         ret = '('
@@ -26,54 +40,140 @@ class Operation:
         return ret + ')'
 
 class Parser:
-    def __init__(self) -> None:
-        self.current_time = 0
-        self.operations = deque()
+    CHUNK_SIZE = 1 << 20
+
+    # source: None for stdin, a file path or a text stream. With use_mmap the
+    # whole file at the given path is memory-mapped instead of read in chunks.
+    def __init__(self, source=None, use_mmap: bool = False, start_time: int = 0) -> None:
+        self.current_time = start_time
+        self.source = source
+        self.use_mmap = use_mmap
 
-    def parse_line(self) -> Operation:
-        line = input()
+    def __iter__(self):
+        parse = self.parse
+        for line in self._lines():
+            op = parse(line)
+            if op is not None:
+                yield op
+
+    def parse(self, line: str) -> Operation:
+        m = _LINE_PATTERN.match(line)
+        if m is not None:
+            op = self._from_match(m)
+            if op is not None:
+                return op
         # remove comments
-        line = line.split('//')[0]
-        if not line or not line.strip():
+        line = line.split('//', 1)[0]
+        if not line or line.isspace():
             return None
-        
-        tokens = re.split('\(|\)|,', line)
-        tokens = [t.strip() for t in tokens if t.strip()]
+
+        tokens = [t for t in map(str.strip, _SPLIT_PATTERN.split(line)) if t]
         action = tokens[0]
-        op = Operation()
-        op.timestamp = self.current_time
-        if action == 'begin':
-            op.action = Action.BEGIN
-            op.txn_id = self._read_num(tokens[1])
-        elif action == "beginRO":
-            op.action = Action.BEGIN_RO
-            op.txn_id = self._read_num(tokens[1])
-        elif action == "end":
-            op.action = Action.END
+        op = Operation(self.current_time)
+        if action == 'R':
+            op.action = Action.READ
             op.txn_id = self._read_num(tokens[1])
-        elif action == "W":
+            op.var_id = self._read_num(tokens[2])
+        elif action == 'W':
             op.action = Action.WRITE
             op.txn_id = self._read_num(tokens[1])
             op.var_id = self._read_num(tokens[2])
             op.var_val = self._read_num(tokens[3])
-        elif action == "R":
-            op.action = Action.READ
+        elif action == 'begin':
+            op.action = Action.BEGIN
             op.txn_id = self._read_num(tokens[1])
-            op.var_id = self._read_num(tokens[2])
-        elif action == "fail":
+        elif action == 'beginRO':
+            op.action = Action.BEGIN_RO
+            op.txn_id = self._read_num(tokens[1])
+        elif action == 'end':
+            op.action = Action.END
+            op.txn_id = self._read_num(tokens[1])
+        elif action == 'fail':
             op.action = Action.FAIL
             op.site_id = self._read_num(tokens[1])
-        elif action == "recover":
+        elif action == 'recover':
             op.action = Action.RECOVER
             op.site_id = self._read_num(tokens[1])
-        elif action == "dump":
-            op.action = Action.DUMP
+        elif action == 'dump' and len(tokens) > 1:
+            # dump(xj): one variable at every site holding it, dump(i): one
+            # site, dump(diff): the committed values changed since the last one
+            arg = tokens[1]
+            if arg == 'diff':
+                op.action = Action.DUMP_DIFF
+            elif arg.startswith('x'):
+                op.action = Action.DUMP
+                op.var_id = self._read_num(arg)
+            else:
+                op.action = Action.DUMP
+                op.site_id = self._read_num(arg)
+        elif action in _NO_ARG_ACTIONS:
+            op.action = _NO_ARG_ACTIONS[action]
+        self.current_time += 1
+        return op
+
+    def _from_match(self, m) -> Operation:
+        action, arg1, arg2, arg3 = m.groups()
+        if action == 'R' and arg2 is not None and arg3 is None:
+            op = Operation(self.current_time, Action.READ, int(arg1), int(arg2))
+        elif action == 'W' and arg3 is not None:
+            op = Operation(self.current_time, Action.WRITE, int(arg1), int(arg2), None, int(arg3))
+        elif action in _TXN_ACTIONS and arg1 is not None and arg2 is None:
+            op = Operation(self.current_time, _TXN_ACTIONS[action], int(arg1))
+        elif action in _SITE_ACTIONS and arg1 is not None and arg2 is None:
+            op = Operation(self.current_time, _SITE_ACTIONS[action], site_id=int(arg1))
+        elif action in _NO_ARG_ACTIONS and arg1 is None:
+            op = Operation(self.current_time, _NO_ARG_ACTIONS[action])
+        else:
+            # dump(xj) and dump(i) are told apart by the prefix, which the
+            # pattern skips
+            return None
         self.current_time += 1
         return op
 
     def _read_num(self, s):
-        for i in range(len(s)):
-            if not s[i].isdigit():
-                continue
-            return int(s[i:])
-        return -1
+        if s.isdigit():
+            return int(s)
+        m = _DIGIT_PATTERN.search(s)
+        if m is None:
+            return -1
+        return int(s[m.start():])
+
+    def _lines(self):
+        if self.source is None:
+            stream = sys.stdin
+            if stream.isatty():
+                # interactive input, don't wait for a full chunk
+                return iter(stream.readline, '')
+            return self._read_chunks(stream)
+        if not isinstance(self.source, str):
+            return self._read_chunks(self.source)
+        if self.use_mmap:
+            return self._read_mmap(self.source)
+        return self._read_file(self.source)
+
+    def _read_file(self, path):
+        with open(path, 'r', buffering=self.CHUNK_SIZE) as f:
+            yield from self._read_chunks(f)
+
+    def _read_chunks(self, stream):
+        rest = ''
+        while True:
+            chunk = stream.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            lines = (rest + chunk).split('\n')
+            rest = lines.pop()
+            yield from lines
+        if rest:
+            yield rest
+
+    def _read_mmap(self, path):
+        with open(path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file
+                return
+            with mm:
+                for line in iter(mm.readline, b''):
+                    yield line.decode()
@@ -1,13 +1,29 @@
+from .constants import LockType
+from .utils import StripedLocks
+
 class LockManager:
     def __init__(self) -> None:
         self.readLocks = dict()
         self.writeLocks = dict()
+        # trxId -> {varId: LockType}, so a transaction's locks can be listed and
+        # released without scanning the lock tables
+        self.trxToLocks = dict()
         self.varsWaitingForCommittedWrites = set()
 
     def addWriteLock(self, varId, trxId):
+        held = self.trxToLocks.setdefault(trxId, dict())
+        if held.get(varId) == LockType.SHARED:
+            # upgrade: the exclusive lock subsumes the shared one
+            self._removeReadLock(varId, trxId)
+        held[varId] = LockType.EXCLUSIVE
         self.writeLocks[varId] = trxId
 
     def addReadLock(self, varId, trxId):
+        held = self.trxToLocks.setdefault(trxId, dict())
+        if varId in held:
+            # already holds a shared or an exclusive lock on the variable
+            return
+        held[varId] = LockType.SHARED
         if varId not in self.readLocks:
             self.readLocks[varId] = set()
         self.readLocks[varId].add(trxId)
@@ -25,38 +41,91 @@ class LockManager:
             return True
         return varId not in self.writeLocks
 
+    def getLockType(self, varId, trxId):
+        return self.trxToLocks.get(trxId, {}).get(varId)
+
+    def getLockHolders(self, varId):
+        lockHolders = set(self.readLocks.get(varId, ()))
+        if varId in self.writeLocks:
+            lockHolders.add(self.writeLocks[varId])
+        return lockHolders
+
     def releaseAllLocks(self, trxId):
-        temp = []
-        for key, s in self.readLocks.items():
-            if trxId in s:
-                s.remove(trxId)
-            if len(s) == 0:
-                temp.append(key)
-        for key in temp:
-            del self.readLocks[key]
-        temp.clear()
-        for key, val in self.writeLocks.items():
-            if trxId == val:
-                temp.append(key)
-        for key in temp:
-            del self.writeLocks[key]
+        held = self.trxToLocks.pop(trxId, None)
+        if not held:
+            return set()
+        for varId, lockType in held.items():
+            if lockType == LockType.EXCLUSIVE:
+                if self.writeLocks.get(varId) == trxId:
+                    del self.writeLocks[varId]
+            else:
+                self._removeReadLock(varId, trxId)
+        return set(held)
 
     def getLockedVariables(self, trxId):
-        lockVars = set()
-        for varId in self.writeLocks.keys():
-            if self.writeLocks[varId] == trxId:
-                lockVars.add(varId)
+        return set(self.trxToLocks.get(trxId, ()))
+
+    def stats(self) -> dict:
+        return {
+            'read_locked_vars': len(self.readLocks),
+            'write_locked_vars': len(self.writeLocks),
+            'lock_holders': len(self.trxToLocks),
+            'vars_waiting_for_committed_writes': len(self.varsWaitingForCommittedWrites),
+        }
 
-        for varId in self.readLocks.keys():
-            if trxId in self.readLocks[varId]:
-                lockVars.add(varId)
+    def _removeReadLock(self, varId, trxId):
+        s = self.readLocks.get(varId)
+        if s is None:
+            return
+        s.discard(trxId)
+        if len(s) == 0:
+            del self.readLocks[varId]
 
-        return lockVars
-    
     def _eraseAllTables(self):
         self.readLocks.clear()
         self.writeLocks.clear()
+        self.trxToLocks.clear()
 
     def clear(self):
         self._eraseAllTables()
         self.varsWaitingForCommittedWrites.clear()
+
+
+class StripedLockManager(LockManager):
+    # LockManager shared by several threads. Every check or update of a
+    # variable's entries runs under the stripe guarding that variable; the
+    # tables themselves are only resized under the GIL. Releasing all the locks
+    # of a transaction and clearing the tables (commit, abort, failure) are
+    # only done while no other thread uses the lock manager.
+    def __init__(self, numOfStripes: int = 64) -> None:
+        super().__init__()
+        self.stripes = StripedLocks(numOfStripes)
+
+    @classmethod
+    def fromLockManager(cls, lockManager: LockManager, numOfStripes: int = 64):
+        striped = cls(numOfStripes)
+        striped.readLocks = lockManager.readLocks
+        striped.writeLocks = lockManager.writeLocks
+        striped.trxToLocks = lockManager.trxToLocks
+        striped.varsWaitingForCommittedWrites = lockManager.varsWaitingForCommittedWrites
+        return striped
+
+    def addWriteLock(self, varId, trxId):
+        with self.stripes.lockFor(varId):
+            super().addWriteLock(varId, trxId)
+
+    def addReadLock(self, varId, trxId):
+        with self.stripes.lockFor(varId):
+            super().addReadLock(varId, trxId)
+
+    def canWrite(self, varId, trxId):
+        with self.stripes.lockFor(varId):
+            return super().canWrite(varId, trxId)
+
+    def canRead(self, varId, trxId):
+        with self.stripes.lockFor(varId):
+            return super().canRead(varId, trxId)
+
+    def getLockHolders(self, varId):
+        with self.stripes.lockFor(varId):
+            return super().getLockHolders(varId)
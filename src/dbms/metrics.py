@@ -0,0 +1,154 @@
+import cProfile
+import time
+from collections import Counter
+
+# Optional instrumentation of a TransactionManager. Nothing is measured unless
+# Metrics.attach (or OperationProfiler) is called: the timers are installed by
+# wrapping the manager's methods and the few hooks inside the manager are
+# guarded by `metrics is not None`.
+
+class Histogram:
+    # Power of two buckets over non-negative integers (microseconds or ticks):
+    # bucket i counts the values v with v.bit_length() == i.
+    NUM_OF_BUCKETS = 64
+
+    def __init__(self) -> None:
+        self.buckets = [0] * self.NUM_OF_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value: int):
+        value = max(0, int(value))
+        self.buckets[min(value.bit_length(), self.NUM_OF_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float):
+        # upper bound of the bucket holding the q-th percentile
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(self.max, (1 << i) - 1)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+            # upper bound of the bucket -> count
+            'buckets': {(1 << i) - 1: n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.actionLatencyUs = dict()
+        # from the first time an operation is put on hold until it runs
+        self.lockWaitTicks = Histogram()
+        self.lockWaitUs = Histogram()
+        # waits ended by the abort of the waiting transaction
+        self.abandonedWaits = 0
+        self.blockedOps = 0
+        # number of waiting operations after every handled operation
+        self.queueDepth = Histogram()
+        self.deadlockDetectionUs = Histogram()
+        self.abortCauses = Counter()
+        # latest logical time seen
+        self.clock = 0
+        # op -> (tick, wall time) of the first time it was put on hold
+        self.waitStart = dict()
+
+    def attach(self, tm):
+        tm.metrics = self
+        clock = time.perf_counter
+        handle = tm._handle_operation
+        detect = tm.detect_and_resolve_deadlock
+        waitingOperations = tm.waitingOperations
+
+        def timed_handle(op):
+            if op.timestamp is not None and op.timestamp > self.clock:
+                self.clock = op.timestamp
+            start = clock()
+            handle(op)
+            end = clock()
+            histogram = self.actionLatencyUs.get(op.action)
+            if histogram is None:
+                histogram = self.actionLatencyUs[op.action] = Histogram()
+            histogram.add((end - start) * 1e6)
+            if op in self.waitStart and op not in waitingOperations:
+                tick, wallStart = self.waitStart.pop(op)
+                self.lockWaitTicks.add(self.clock - tick)
+                self.lockWaitUs.add((end - wallStart) * 1e6)
+            self.queueDepth.add(len(waitingOperations))
+
+        def timed_detect(timestamp=None):
+            if not tm.deadlockPolicy.hasWork():
+                return
+            start = clock()
+            detect(timestamp)
+            self.deadlockDetectionUs.add((clock() - start) * 1e6)
+
+        tm._handle_operation = timed_handle
+        tm.detect_and_resolve_deadlock = timed_detect
+        return self
+
+    def opBlocked(self, op):
+        if op not in self.waitStart:
+            self.blockedOps += 1
+            self.waitStart[op] = (self.clock, time.perf_counter())
+
+    def waitsAbandoned(self, ops):
+        for op in ops:
+            if self.waitStart.pop(op, None) is not None:
+                self.abandonedWaits += 1
+
+    def aborted(self, trxId, cause):
+        self.abortCauses[cause.name.lower() if cause is not None else 'other'] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            'latency_us': {action.name.lower(): h.snapshot() for action, h in self.actionLatencyUs.items()},
+            'lock_wait_ticks': self.lockWaitTicks.snapshot(),
+            'lock_wait_us': self.lockWaitUs.snapshot(),
+            'blocked_ops': self.blockedOps,
+            'abandoned_waits': self.abandonedWaits,
+            'waiting_ops': len(self.waitStart),
+            'queue_depth': self.queueDepth.snapshot(),
+            'deadlock_detection_us': self.deadlockDetectionUs.snapshot(),
+            'abort_causes': dict(self.abortCauses),
+        }
+
+
+class OperationProfiler:
+    # Runs cProfile only while the manager handles an operation
+    def __init__(self, tm) -> None:
+        self.profile = cProfile.Profile()
+        handle = tm._handle_operation
+        profile = self.profile
+
+        def profiled_handle(op):
+            profile.enable()
+            try:
+                handle(op)
+            finally:
+                profile.disable()
+
+        tm._handle_operation = profiled_handle
+
+    def dump(self, path: str):
+        self.profile.dump_stats(path)
@@ -0,0 +1,69 @@
+from .constants import DataType
+
+class Placement:
+    def __init__(self, numOfSites: int, numOfVars: int) -> None:
+        self.numOfSites = numOfSites
+        self.numOfVars = numOfVars
+        # varId -> tuple of sites holding the variable, ordered by site id
+        self.varToSites = dict()
+        self.varToDataType = dict()
+        # upSites[siteId] == 1 iff the site is up (index 0 is unused)
+        self.upSites = bytearray(b'\x01' * (numOfSites + 1))
+
+    def addVar(self, varId: int, sites: list, datatype: DataType):
+        self.varToSites[varId] = tuple(sorted(sites, key=lambda s: s.id))
+        self.varToDataType[varId] = datatype
+
+    def sitesHolding(self, varId: int):
+        return self.varToSites.get(varId, ())
+
+    def availSitesHolding(self, varId: int):
+        up = self.upSites
+        return [site for site in self.varToSites.get(varId, ()) if up[site.id]]
+
+    def isReplicated(self, varId: int):
+        return self.varToDataType.get(varId) == DataType.REPLICATED
+
+    def isUp(self, siteId: int):
+        return self.upSites[siteId] == 1
+
+    def setUp(self, siteId: int, isUp: bool):
+        self.upSites[siteId] = 1 if isUp else 0
+
+    def replaceSites(self, idToSites: dict):
+        # Points every variable to the given site objects with the same ids (e.g.
+        # proxies of sites running in other processes)
+        self.varToSites = {varId: tuple(idToSites[site.id] for site in sites)
+                           for varId, sites in self.varToSites.items()}
+        for site in idToSites.values():
+            site.attachPlacement(self)
+
+    @classmethod
+    def fromSiteColumn(cls, siteOf, idToSites: dict):
+        # siteOf[varId]: id of the only site holding a non-replicated variable,
+        # 0 for a replicated variable (held by every site); index 0 is unused
+        allSites = tuple(idToSites[siteId] for siteId in sorted(idToSites))
+        placement = cls(len(allSites), len(siteOf) - 1)
+        placement.varToSites = {varId: (idToSites[siteId],) if siteId else allSites
+                                for varId, siteId in enumerate(siteOf) if varId}
+        placement.varToDataType = {varId: DataType.NON_REPLICATED if siteId else DataType.REPLICATED
+                                   for varId, siteId in enumerate(siteOf) if varId}
+        return placement
+
+    @classmethod
+    def fromSites(cls, idToSites: dict):
+        varToSites = dict()
+        varToDataType = dict()
+        for site in idToSites.values():
+            for varId in site.nonReplicatedVarIds:
+                varToSites.setdefault(varId, []).append(site)
+                varToDataType[varId] = DataType.NON_REPLICATED
+            for varId in site.replicatedVarIds:
+                varToSites.setdefault(varId, []).append(site)
+                varToDataType[varId] = DataType.REPLICATED
+        placement = cls(max(idToSites.keys(), default=0), max(varToSites.keys(), default=0))
+        for varId, sites in varToSites.items():
+            placement.addVar(varId, sites, varToDataType[varId])
+        for site in idToSites.values():
+            site.attachPlacement(placement)
+        return placement
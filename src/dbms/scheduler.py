@@ -0,0 +1,139 @@
+from .constants import Action, Event
+
+# Retry of the operations on hold. The TransactionManager reports the
+# variables whose locks were released (commit/abort, including committed writes
+# on recovered sites) and the sites that failed or recovered; the scheduler
+# decides which waiting operations are handled again and when.
+
+class WakeAll:
+    # Every operation on a released variable is taken off the wait queue and
+    # handled again before the next instruction; one that still cannot run is
+    # put on hold again (and reported again). The expected outputs in
+    # `outputs` are produced with this scheduler.
+    name = 'wake-all'
+
+    def varsReleased(self, tm, varIds):
+        opsToWakeUp = list()
+        for varId in varIds:
+            opsToWakeUp.extend(tm.waitingOperations.opsOn(varId))
+        for op in opsToWakeUp:
+            tm.events.emit(Event.WAKE_UP_OP, op)
+            tm.waitingOperations.remove(op)
+            tm.pending_operations.append(op)
+
+    def siteChanged(self, tm, siteId):
+        pass
+
+    def hasWork(self):
+        return False
+
+    def retry(self, tm):
+        pass
+
+
+class ConditionScheduler:
+    # An operation stays queued until the condition it waits on changes: a lock
+    # release or a committed write on its variable, or a site holding the
+    # variable failing or recovering. The operations on such a variable are then
+    # checked in FIFO order and handled only if they can run now; once one
+    # cannot, the ones behind it stay queued, except those of a transaction
+    # already holding a lock on the variable (as with wake-all, the waits ahead
+    # of them may be waits for that very transaction). Operations left waiting
+    # get their waits-for edges refreshed (the lock holders may have changed,
+    # and each one waits for the conflicting ones queued ahead of it) without
+    # being reported again.
+    name = 'event'
+
+    def __init__(self) -> None:
+        # variables whose condition changed, insertion ordered
+        self.changedVarIds = dict()
+
+    def varsReleased(self, tm, varIds):
+        waitingOperations = tm.waitingOperations
+        for varId in sorted(varIds):
+            if waitingOperations.hasOpsOn(varId):
+                self.changedVarIds[varId] = None
+
+    def siteChanged(self, tm, siteId):
+        site = tm.idToSites[siteId]
+        for varId in tm.waitingOperations.waitingVarIds():
+            if site in tm.placement.sitesHolding(varId):
+                self.changedVarIds[varId] = None
+
+    def hasWork(self):
+        return bool(self.changedVarIds)
+
+    def retry(self, tm):
+        while self.changedVarIds:
+            varId = next(iter(self.changedVarIds))
+            del self.changedVarIds[varId]
+            self._retryVar(tm, varId)
+
+    def _retryVar(self, tm, varId):
+        waitingOperations = tm.waitingOperations
+        waiting = list()
+        for op in waitingOperations.opsOn(varId):
+            if op not in waitingOperations:
+                # dropped by an abort caused by an earlier retry
+                continue
+            if waiting and not self._holdsLock(tm, op):
+                waiting.append(op)
+                continue
+            if not self._canRun(tm, op):
+                waiting.append(op)
+                continue
+            tm.events.emit(Event.WAKE_UP_OP, op)
+            waitingOperations.remove(op)
+            # every operation queued before it has run or is skipped, so it
+            # does not wait for the writers queued behind it
+            tm.retryingVarId = varId
+            try:
+                tm._handle_operation(op)
+            finally:
+                tm.retryingVarId = None
+            if op in waitingOperations:
+                waiting.append(op)
+        if waiting:
+            self._refreshWaits(tm, waiting)
+
+    def _holdsLock(self, tm, op):
+        for site in tm.getAvailSitesHoldingVarId(op.var_id):
+            if op.txn_id in site.lock_manager.getLockHolders(op.var_id):
+                return True
+        return False
+
+    def _canRun(self, tm, op):
+        trx = tm.idToTransactions.get(op.txn_id)
+        if trx is None or not tm.isLive(trx) or trx.is_read_only:
+            return True
+        tm.retryingVarId = op.var_id
+        try:
+            if op.action == Action.READ:
+                return tm.canRead(op.var_id, op.txn_id)
+            return tm.canWrite(op.var_id, op.txn_id)
+        finally:
+            tm.retryingVarId = None
+
+    def _refreshWaits(self, tm, ops):
+        # the lock holders, and the conflicting operations of other
+        # transactions queued ahead: they get the lock first and keep it until
+        # their transaction ends. An operation of a lock holder skips the queue.
+        ahead = list()
+        for op in ops:
+            if op not in tm.waitingOperations:
+                continue
+            if not self._holdsLock(tm, op):
+                for aheadOp in ahead:
+                    if aheadOp.txn_id != op.txn_id and (aheadOp.action == Action.WRITE
+                                                        or op.action == Action.WRITE):
+                        tm._add_wait_edge(aheadOp.txn_id, op.txn_id)
+            for holderId in tm._getLockHolders(op):
+                tm._add_wait_edge(holderId, op.txn_id)
+            ahead.append(op)
+        tm.detect_and_resolve_deadlock()
+
+
+SCHEDULERS = {
+    WakeAll.name: WakeAll,
+    ConditionScheduler.name: ConditionScheduler,
+}
@@ -0,0 +1,217 @@
+import asyncio
+
+from .api import Blocked, Engine
+from .constants import AbortCause, Action, Event, TransactionStatus
+from .events import EVENT_FORMATS, EventSink, format_json, format_text
+from .input_parser import Parser
+
+# TCP front end: every connection sends instructions in the input grammar, one
+# per line, and gets back the events of its own transactions followed by a
+# DONE line once the instruction has been executed. An instruction blocked on a
+# lock waits for its release without holding up the other connections.
+
+DONE = '[DONE]'
+
+# events whose first argument is an Operation instead of a transaction id
+_OP_EVENTS = (Event.WRITE_ON_HOLD, Event.WAKE_UP_OP)
+
+
+class ClientSession:
+    def __init__(self, writer) -> None:
+        self.writer = writer
+        self.trxIds = set()
+        # operation of this client waiting for a lock and the future resolved
+        # once it has been executed (or its transaction ended)
+        self.blockedOp = None
+        self.released = None
+        self.closed = False
+
+    def send(self, line: str) -> None:
+        if not self.closed:
+            self.writer.write((line + '\n').encode())
+
+    def block(self, op):
+        self.blockedOp = op
+        self.released = asyncio.get_running_loop().create_future()
+        return self.released
+
+    def release(self):
+        if self.released is not None and not self.released.done():
+            self.released.set_result(None)
+        self.blockedOp = None
+        self.released = None
+
+
+class RoutingSink(EventSink):
+    # Sends every event to the session owning its transaction, events without a
+    # transaction (site failure/recovery, dump) to the session that issued them.
+    def __init__(self, server) -> None:
+        self.server = server
+
+    def emit(self, event: Event, *args) -> None:
+        self.server.route(event, args)
+
+
+class Server:
+    def __init__(self, db, host: str = '127.0.0.1', port: int = 7070, output: str = 'text', metrics=None,
+                 deadlockPolicy=None, scheduler=None, catchUpOnRecover: bool = False) -> None:
+        self.db = db
+        self.host = host
+        self.port = port
+        self.format = format_json if output == 'jsonl' else format_text
+        self.engine = Engine(db, RoutingSink(self), deadlockPolicy, scheduler, catchUpOnRecover)
+        self.tm = self.engine.tm
+        if metrics is not None:
+            metrics.attach(self.tm)
+        # one clock for all the connections
+        self.parser = Parser(start_time=db.startTime)
+        self.trxToSession = dict()
+        # session whose instruction is being executed
+        self.current = None
+        # operations woken up while executing the current instruction
+        self.wokenOps = list()
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.db.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+    async def _serve_client(self, reader, writer):
+        session = ClientSession(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                released = self.execute(session, line.decode())
+                if released is not None:
+                    await released
+                session.send(DONE)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._disconnect(session)
+            writer.close()
+
+    def execute(self, session, line: str):
+        # Runs one instruction, returns a future if it is blocked
+        try:
+            op = self.parser.parse(line)
+        except (IndexError, ValueError):
+            session.send(f'[ERROR] cannot parse {line.strip()}')
+            return None
+        if op is None:
+            # blank line or comment
+            return None
+        if op.action is None:
+            session.send(f'[ERROR] unknown instruction {line.strip()}')
+            return None
+        error = self._check_owner(session, op)
+        if error is not None:
+            session.send(error)
+            return None
+
+        self.current = session
+        try:
+            outcome = self.engine.execute(op)
+        finally:
+            self.current = None
+        self._release_woken_ops()
+        if isinstance(outcome, Blocked):
+            return session.block(op)
+        return None
+
+    def _check_owner(self, session, op):
+        if op.txn_id is None:
+            return None
+        if op.action in (Action.BEGIN, Action.BEGIN_RO):
+            if op.txn_id in self.trxToSession or op.txn_id in self.tm.idToTransactions:
+                return f'[ERROR] T{op.txn_id} already exists'
+            self.trxToSession[op.txn_id] = session
+            session.trxIds.add(op.txn_id)
+            return None
+        owner = self.trxToSession.get(op.txn_id)
+        # a transaction no longer live is no longer owned, the engine answers
+        # for it (already committed, aborted or unknown)
+        if owner is not session and (owner is not None or op.txn_id in self.tm.idToTransactions):
+            return f'[ERROR] unknown transaction T{op.txn_id}'
+        return None
+
+    def route(self, event, args):
+        if event in _OP_EVENTS:
+            trxIds = (args[0].txn_id,)
+            if event == Event.WAKE_UP_OP:
+                self.wokenOps.append(args[0])
+        elif event == Event.AFFECTED_TXNS:
+            trxIds = args[0]
+        elif EVENT_FORMATS[event][1][0] == 'txn':
+            trxIds = (args[0],)
+        else:
+            trxIds = ()
+
+        sessions = [self.trxToSession[trxId] for trxId in trxIds if trxId in self.trxToSession]
+        if event == Event.AFFECTED_TXNS or not sessions:
+            sessions.append(self.current)
+        text = self.format(event, args)
+        for session in dict.fromkeys(sessions):
+            if session is not None:
+                session.send(text)
+
+        if event in (Event.COMMIT, Event.ABORT):
+            # a blocked operation of a finished transaction is dropped from the
+            # queue, and its id can be used by a new transaction
+            session = self.trxToSession.pop(args[0], None)
+            if session is not None:
+                session.trxIds.discard(args[0])
+                if session.blockedOp is not None and session.blockedOp.txn_id == args[0]:
+                    session.release()
+
+    def _release_woken_ops(self):
+        wokenOps = self.wokenOps
+        self.wokenOps = list()
+        for op in wokenOps:
+            session = self.trxToSession.get(op.txn_id)
+            if session is not None and session.blockedOp is op and op not in self.tm.waitingOperations:
+                session.release()
+
+    def _disconnect(self, session):
+        # transactions left open by a closed connection are aborted
+        session.closed = True
+        session.release()
+        self.current = session
+        try:
+            for trxId in sorted(session.trxIds):
+                trx = self.tm.idToTransactions.get(trxId)
+                if trx is not None and trx.status in (TransactionStatus.ACTIVE, TransactionStatus.ABORTING):
+                    self.tm.abort(trxId, AbortCause.CLIENT_DISCONNECT)
+            self.tm.drain()
+        finally:
+            self.current = None
+        for trxId in session.trxIds:
+            self.trxToSession.pop(trxId, None)
+        self._release_woken_ops()
+
+
+def serve(db, host: str = '127.0.0.1', port: int = 7070, output: str = 'text', metrics=None, deadlockPolicy=None,
+          scheduler=None, catchUpOnRecover: bool = False):
+    server = Server(db, host, port, output, metrics, deadlockPolicy, scheduler, catchUpOnRecover)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return server.tm
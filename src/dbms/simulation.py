@@ -0,0 +1,320 @@
+import heapq
+import random
+import time
+
+from .api import Blocked, Engine, TransactionError
+from .constants import Action
+from .events import EventSink
+from .input_parser import Operation
+from .workload import var_picker
+
+# Discrete-event simulation of clients driving the engine through the embedded
+# API. Time is virtual (milliseconds) and jumps from one event of a priority
+# queue to the next, so a run is deterministic for a seed and costs the engine
+# work only, not the delays it models.
+#
+# An instruction takes effect in the engine when its client issues it, the
+# client gets the answer after the delay of the sites involved: every site is
+# a FIFO server with a service time distribution behind a link with a one-way
+# delay distribution, and a request to several sites waits for the slowest
+# answer. Reads go to the first available copy, writes to every available copy
+# and end() to every site the transaction accessed; begin() is answered by the
+# transaction manager at once. Sites fail and recover after time-to-failure and
+# downtime draws. A client aborts its transaction when an instruction stays on
+# hold longer than its timeout, as a real client would; waits the engine never
+# ends (e.g. an operation queued on a variable whose lock was lost with a failed
+# site) then cost a timeout instead of the client. Engine timestamps are the
+# virtual time in microseconds.
+
+_DISTRIBUTIONS = {
+    'const': (1, lambda value: lambda rand: value),
+    'exp': (1, lambda mean: (lambda rand: rand.expovariate(1.0 / mean)) if mean > 0 else (lambda rand: 0.0)),
+    'uniform': (2, lambda low, high: lambda rand: rand.uniform(low, high)),
+    'lognormal': (2, lambda mu, sigma: lambda rand: rand.lognormvariate(mu, sigma)),
+}
+
+
+def make_distribution(spec: str):
+    # 'const:V' (or just V), 'exp:MEAN', 'uniform:LOW:HIGH' or
+    # 'lognormal:MU:SIGMA'; returns a function drawing from a random.Random
+    name, _, params = spec.partition(':')
+    if not params:
+        name, params = 'const', name
+    entry = _DISTRIBUTIONS.get(name)
+    try:
+        values = [float(param) for param in params.split(':')]
+    except ValueError:
+        values = None
+    if entry is None or values is None or len(values) != entry[0]:
+        raise ValueError(f'unknown distribution {spec!r} (const:V, exp:MEAN, uniform:LOW:HIGH, lognormal:MU:SIGMA)')
+    return entry[1](*values)
+
+
+def _summary(vals):
+    vals = sorted(vals)
+    if not vals:
+        return {'count': 0}
+
+    def percentile(q):
+        return vals[min(len(vals) - 1, int(round(q / 100.0 * (len(vals) - 1))))]
+    return {
+        'count': len(vals),
+        'mean': sum(vals) / len(vals),
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p99': percentile(99),
+        'max': vals[-1],
+    }
+
+
+class SiteModel:
+    # FIFO server behind a link
+    def __init__(self, siteId: int, service, link) -> None:
+        self.id = siteId
+        self.service = service
+        self.link = link
+        self.busyUntil = 0.0
+        self.busyTime = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def request(self, now: float, rand) -> float:
+        # time at which the answer to a request sent at now is back
+        start = max(now + self.link(rand), self.busyUntil)
+        service = self.service(rand)
+        self.busyUntil = start + service
+        self.busyTime += service
+        self.requests += 1
+        return self.busyUntil + self.link(rand)
+
+
+class Simulator:
+    # service, link, think, timeToFailure, downtime: distribution specs in
+    # milliseconds (see make_distribution); siteService and siteLink: siteId ->
+    # spec overriding service and link for one site. timeToFailure None: the
+    # sites never fail. duration: stop at this virtual time (ms) instead of
+    # once every client has run its transactions. clientTimeout: ms an
+    # instruction may stay on hold before the client aborts (None: no limit).
+    def __init__(self, db, numOfClients: int = 8, numOfTxns: int = 1000, seed: int = 0, opsPerTxn: int = 5,
+                 readRatio: float = 0.5, zipfS: float = 0.0, roShare: float = 0.1, think: str = 'exp:1',
+                 service: str = 'exp:0.2', link: str = 'const:0.5', siteService: dict = None,
+                 siteLink: dict = None, timeToFailure: str = None, downtime: str = 'exp:100',
+                 duration: float = None, clientTimeout: float = 1000.0, events: EventSink = None,
+                 deadlockPolicy=None, scheduler=None, catchUpOnRecover: bool = False) -> None:
+        self.engine = Engine(db, events, deadlockPolicy, scheduler, catchUpOnRecover)
+        self.placement = db.placement
+        self.numOfVars = db.numOfVars
+        self.numOfClients = numOfClients
+        self.numOfTxns = numOfTxns
+        self.seed = seed
+        self.opsPerTxn = opsPerTxn
+        self.readRatio = readRatio
+        self.zipfS = zipfS
+        self.roShare = roShare
+        self.think = make_distribution(think)
+        self.timeToFailure = make_distribution(timeToFailure) if timeToFailure is not None else None
+        self.downtime = make_distribution(downtime)
+        self.duration = duration
+        self.clientTimeout = clientTimeout
+        self.config = {
+            'clients': numOfClients, 'txns': numOfTxns, 'seed': seed, 'ops_per_txn': opsPerTxn,
+            'read_ratio': readRatio, 'zipf': zipfS, 'ro_share': roShare, 'think': think, 'service': service,
+            'link': link, 'site_service': dict(siteService or {}), 'site_link': dict(siteLink or {}),
+            'time_to_failure': timeToFailure, 'downtime': downtime, 'duration': duration,
+            'client_timeout': clientTimeout,
+        }
+        siteService = siteService or {}
+        siteLink = siteLink or {}
+        self.sites = {siteId: SiteModel(siteId, make_distribution(siteService.get(siteId, service)),
+                                        make_distribution(siteLink.get(siteId, link)))
+                      for siteId in sorted(db.sites)}
+        # draws of the variables, the site delays and the failures, in event
+        # order (the clients have their own streams for the rest)
+        self.pickVar = var_picker(random.Random(f'{seed}:vars'), self.numOfVars, zipfS)
+        self.siteRand = random.Random(f'{seed}:sites')
+        self.failureRand = random.Random(f'{seed}:failures')
+
+        self.now = 0.0
+        # (time, sequence number, function, args)
+        self.queue = list()
+        self.sequence = 0
+        self.processedEvents = 0
+        # clients waiting on a Blocked handle: [(client, handle)]
+        self.parked = list()
+        # client resumptions in the queue
+        self.pendingResumes = 0
+        self.activeClients = 0
+        self.downSiteIds = set()
+        self.startedTxns = 0
+        self.committed = 0
+        self.aborted = 0
+        self.timeouts = 0
+        self.commitLatencyMs = {False: list(), True: list()}
+        self.blockedMs = list()
+        self.stuck = False
+        self.wallTime = 0.0
+
+    def _schedule(self, at: float, fn, *args) -> None:
+        heapq.heappush(self.queue, (at, self.sequence, fn, args))
+        self.sequence += 1
+
+    def _timestamp(self) -> int:
+        return max(int(self.now * 1000), self.engine.clock)
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        for clientId in range(1, self.numOfClients + 1):
+            self.activeClients += 1
+            self.pendingResumes += 1
+            self._schedule(0.0, self._resume, self._client(clientId), None)
+        if self.timeToFailure is not None:
+            for siteId in self.sites:
+                self._schedule(self.timeToFailure(self.failureRand), self._fail, siteId)
+        queue = self.queue
+        # every operation on hold is the instruction of a parked client, the
+        # parked clients are only scanned when some of them can go on
+        waitingOperations = self.engine.tm.waitingOperations
+        while queue and self.activeClients:
+            at, _, fn, args = heapq.heappop(queue)
+            if self.duration is not None and at > self.duration:
+                self.now = self.duration
+                break
+            self.now = at
+            fn(*args)
+            self.processedEvents += 1
+            if len(self.parked) > len(waitingOperations):
+                self._unpark()
+            if (self.parked and not self.pendingResumes and not self.downSiteIds
+                    and self.clientTimeout is None):
+                # every client waits and no recovery or timeout can release them
+                self.stuck = True
+                break
+        self.wallTime = time.perf_counter() - start
+        return self.report()
+
+    def _resume(self, client, value) -> None:
+        self.pendingResumes -= 1
+        try:
+            step = client.send(value)
+        except StopIteration:
+            self.activeClients -= 1
+            return
+        if isinstance(step, Blocked):
+            self.parked.append((client, step))
+            if self.clientTimeout is not None:
+                self._schedule(self.now + self.clientTimeout, self._timeout, step)
+        else:
+            self.pendingResumes += 1
+            self._schedule(self.now + step, self._resume, client, None)
+
+    def _unpark(self) -> None:
+        waiting = list()
+        for client, handle in self.parked:
+            if handle.done:
+                self.pendingResumes += 1
+                self._schedule(self.now, self._resume, client, handle.outcome)
+            else:
+                waiting.append((client, handle))
+        self.parked = waiting
+
+    def _timeout(self, handle: Blocked) -> None:
+        trxId = handle.op.txn_id
+        if not handle.done and trxId in self.engine.tm.idToTransactions:
+            # the abort settles the handle, the client is resumed by _unpark
+            self.engine.abort(trxId)
+            self.timeouts += 1
+
+    def _fail(self, siteId: int) -> None:
+        self.engine.execute(Operation(self._timestamp(), Action.FAIL, site_id=siteId))
+        self.sites[siteId].failures += 1
+        self.downSiteIds.add(siteId)
+        self._schedule(self.now + self.downtime(self.failureRand), self._recover, siteId)
+
+    def _recover(self, siteId: int) -> None:
+        self.engine.execute(Operation(self._timestamp(), Action.RECOVER, site_id=siteId))
+        self.downSiteIds.discard(siteId)
+        self._schedule(self.now + self.timeToFailure(self.failureRand), self._fail, siteId)
+
+    def _call(self, op: Operation):
+        # Runs the instruction, parks the client while it is on hold
+        op.timestamp = self._timestamp()
+        outcome = self.engine.execute(op)
+        if isinstance(outcome, Blocked):
+            blockedAt = self.now
+            outcome = yield outcome
+            self.blockedMs.append(self.now - blockedAt)
+        return outcome
+
+    def _delay(self, siteIds) -> float:
+        # until the answers of all the given sites are back
+        now = self.now
+        return max((self.sites[siteId].request(now, self.siteRand) for siteId in siteIds), default=now) - now
+
+    def _client(self, clientId: int):
+        # Yields delays to sleep for and Blocked handles to wait on
+        rand = random.Random(f'{self.seed}:client{clientId}')
+        pickVar = self.pickVar
+        engine = self.engine
+        while self.startedTxns < self.numOfTxns:
+            self.startedTxns += 1
+            yield self.think(rand)
+            isReadOnly = rand.random() < self.roShare
+            trxId = engine.nextTrxId
+            beginTime = self.now
+            yield from self._call(Operation(None, Action.BEGIN_RO if isReadOnly else Action.BEGIN, trxId))
+            siteIds = set()
+            outcome = None
+            for _ in range(self.opsPerTxn):
+                yield self.think(rand)
+                varId = pickVar()
+                if isReadOnly or rand.random() < self.readRatio:
+                    outcome = yield from self._call(Operation(None, Action.READ, trxId, varId))
+                    sites = [site.id for site in self.placement.availSitesHolding(varId)[:1]]
+                else:
+                    outcome = yield from self._call(Operation(None, Action.WRITE, trxId, varId, None,
+                                                              rand.randint(0, 9999)))
+                    sites = outcome
+                if isinstance(outcome, TransactionError):
+                    if trxId in engine.tm.idToTransactions:
+                        engine.abort(trxId)
+                    break
+                siteIds.update(sites)
+                yield self._delay(sites)
+            else:
+                outcome = yield from self._call(Operation(None, Action.END, trxId))
+                yield self._delay(sorted(siteIds))
+            if outcome is True:
+                self.committed += 1
+                self.commitLatencyMs[isReadOnly].append(self.now - beginTime)
+            else:
+                self.aborted += 1
+
+    def report(self) -> dict:
+        seconds = self.now / 1000.0
+        blocked = _summary(self.blockedMs)
+        blocked['total'] = sum(self.blockedMs)
+        return {
+            'config': self.config,
+            'virtual_time_ms': self.now,
+            'wall_time_sec': self.wallTime,
+            'events': self.processedEvents,
+            'stuck': self.stuck,
+            'transactions': {
+                'started': self.startedTxns,
+                'committed': self.committed,
+                'aborted': self.aborted,
+                'unfinished': self.startedTxns - self.committed - self.aborted,
+                'timed_out': self.timeouts,
+            },
+            'throughput_per_sec': self.committed / seconds if seconds else 0.0,
+            'commit_latency_ms': {
+                'read_write': _summary(self.commitLatencyMs[False]),
+                'read_only': _summary(self.commitLatencyMs[True]),
+            },
+            'blocking_ms': blocked,
+            'sites': {siteId: {
+                'requests': site.requests,
+                'utilization': site.busyTime / self.now if self.now else 0.0,
+                'failures': site.failures,
+            } for siteId, site in self.sites.items()},
+        }
@@ -1,48 +1,127 @@
-from .lock_manager import LockManager
+from array import array
+from operator import methodcaller
+
+from .lock_manager import LockManager, StripedLockManager
 from .constants import DataType
-from .utils import Interval
+from .utils import FailureHistory
+from .var_store import DictVarStore
 
 class Site:
-    def __init__(self, id: int) -> None:
+    # False for the local sites, True for proxies of sites running in another
+    # process (see call_sites)
+    isRemote = False
+
+    # store: DictVarStore (default) or ColumnarVarStore, holds the committed,
+    # uncommitted and older versions of the variables
+    def __init__(self, id: int, store=None) -> None:
         self.lock_manager = LockManager()
         self.id = id
         self.is_down = False
+        self.placement = None
 
-        self.replicatedVarIds = list()
-        self.nonReplicatedVarIds = list()
-        self.varToCommittedVal = dict()
-        self.varToCommittedTime = dict()
-        self.varToCurrVal = dict()
-        self.terminatedIntervals = list()
+        self.replicatedVarIds = set()
+        self.nonReplicatedVarIds = set()
+        self.store = store if store is not None else DictVarStore()
+        self.failureHistory = FailureHistory()
         self.visitedTrxIds = set()
-        self.writtenVarIds = set()
+        # trxId -> variables the transaction wrote at the site and has not
+        # committed yet
+        self.writtenVarIds = dict()
+        # SiteStorage when committed writes are made durable
+        self.storage = None
+        # variables whose committed value changed since the last dump(diff)
+        self.changedVarIds = set()
 
-    def initVarValues(self, varId: int, datatype: DataType):
+    def registerVar(self, varId: int, datatype: DataType):
         if datatype == DataType.REPLICATED:
-            self.replicatedVarIds.append(varId)
+            self.replicatedVarIds.add(varId)
         else:
-            self.nonReplicatedVarIds.append(varId)
-        
-        self.varToCommittedVal[varId] = varId * 10
-        self.varToCommittedTime[varId] = 0
-        self.varToCurrVal[varId] = varId * 10
+            self.nonReplicatedVarIds.add(varId)
+
+    def initVarValues(self, varId: int, datatype: DataType):
+        self.registerVar(varId, datatype)
+        self.store.addVar(varId, varId * 10)
+
+    def exportImage(self):
+        # Committed state saved in a DatabaseImage (uncommitted writes and locks
+        # are not)
+        history = self.failureHistory
+        return (self.is_down, list(history.startTimes), list(history.endTimes),
+                sorted(self.lock_manager.varsWaitingForCommittedWrites), *self.store.exportVersions())
+
+    def loadImage(self, isDown, startTimes, endTimes, waitingVarIds, replicatedVarIds, columns):
+        # columns: the version columns of exportVersions
+        self.replicatedVarIds = replicatedVarIds
+        self.nonReplicatedVarIds = set(columns[0]).difference(replicatedVarIds)
+        self.store.importVersions(*columns)
+        self.failureHistory.startTimes = list(startTimes)
+        self.failureHistory.endTimes = list(endTimes)
+        self.lock_manager.varsWaitingForCommittedWrites.update(waitingVarIds)
+        self.is_down = isDown
+
+    def attachStorage(self, storage):
+        # Restores the committed state if the storage holds one, otherwise saves
+        # the current state as the first checkpoint.
+        self.storage = storage
+        if storage.exists():
+            self._loadFromStorage()
+        else:
+            storage.checkpoint(self.store.exportVersions())
+
+    def _loadFromStorage(self):
+        # latest checkpoint plus the commits logged after it
+        self.store.importVersions(*self.storage.readCheckpoint())
+        for commitTime, writes in self.storage.replayLog():
+            for varId, value in writes:
+                self.store.appendVersion(varId, commitTime, value)
+
+    def lastCommitTime(self):
+        return self.store.lastCommitTime()
+
+    def attachPlacement(self, placement):
+        self.placement = placement
+        placement.setUp(self.id, not self.is_down)
+
+    def __getstate__(self):
+        # A site is pickled alone (sent to or back from a worker process): the
+        # placement references every other site and its store. The receiving
+        # side attaches its own, or none in a worker, whose up flag is kept by
+        # the coordinator's RemoteSite.
+        state = self.__dict__.copy()
+        state['placement'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
 
     def readValue(self, varId: int, trxId: int):
         self.visitedTrxIds.add(trxId)
-        return self.varToCurrVal.get(varId)
+        return self.store.read(varId)
 
     def writeValue(self, varId: int, writeToVal: int, trxId: int):
-        self.varToCurrVal[varId] = writeToVal
+        self.store.write(varId, writeToVal)
         self.visitedTrxIds.add(trxId)
-        self.writtenVarIds.add(varId)
+        written = self.writtenVarIds.get(trxId)
+        if written is None:
+            written = self.writtenVarIds[trxId] = set()
+        written.add(varId)
 
-    def commitValue(self, txn_id: int, currTime: int):
+    def commitValue(self, txn_id: int, currTime: int, gcHorizon: int = None):
+        # Returns the variables the transaction wrote at the site
+        writtenVarIds = self.writtenVarIds.pop(txn_id, ())
         if self.is_down:
-            return 
-        lockVariables = self.lock_manager.getLockedVariables(txn_id)
-        for varId in lockVariables:
-            self.varToCommittedVal[varId] = self.varToCurrVal.get(varId)
-            self.varToCommittedTime[varId] = currTime
+            return writtenVarIds
+        # the transaction holds the exclusive lock of every variable it wrote
+        committedWrites = list()
+        for varId in writtenVarIds:
+            val = self.store.commit(varId, currTime)
+            committedWrites.append((varId, val))
+            self.store.pruneVersions(varId, gcHorizon)
+        self.changedVarIds.update(writtenVarIds)
+        if self.storage is not None and committedWrites:
+            self.storage.logCommit(currTime, committedWrites)
+            if self.storage.shouldCheckpoint():
+                self.storage.checkpoint(self.store.exportVersions())
 
         # Remove trxId from visitedTrxIds (Used for fail site. When site fails, this
         # transaction is no longer affected).
@@ -50,39 +129,169 @@ class Site:
             self.visitedTrxIds.remove(txn_id)
 
         # Remove varIds which transaction modified from lockManager's
-        # varsWaitingForCommittedWrites and clear writtenVarIds. (Used for recovery
-        # site release read locks)
-        for varId in self.writtenVarIds:
-            if varId in self.lock_manager.varsWaitingForCommittedWrites:
-                self.lock_manager.varsWaitingForCommittedWrites.remove(varId)
-        self.writtenVarIds.clear()
+        # varsWaitingForCommittedWrites. (Used for recovery site release read locks)
+        for varId in writtenVarIds:
+            self.lock_manager.varsWaitingForCommittedWrites.discard(varId)
+        return writtenVarIds
+
+    def getLockedVariables(self, trxId: int):
+        return self.lock_manager.getLockedVariables(trxId)
+
+    def releaseAllLocks(self, trxId: int):
+        return self.lock_manager.releaseAllLocks(trxId)
+
+    def addWriteLock(self, varId: int, trxId: int):
+        return self.lock_manager.addWriteLock(varId, trxId)
+
+    def readVersion(self, varId: int, timestamp: int):
+        # Latest version committed at or before timestamp, as (commit time, value)
+        return self.store.readVersion(varId, timestamp)
+
+    def committedValues(self):
+        # [(varId, committed value)] ordered by varId
+        return self.store.committedItems()
+
+    def committedValue(self, varId: int):
+        return self.store.committedValue(varId)
+
+    def takeChangedValues(self):
+        # committedValues of the variables committed since the previous call
+        changed = [(varId, self.store.committedValue(varId)) for varId in sorted(self.changedVarIds)]
+        self.changedVarIds.clear()
+        return changed
+
+    def collectVersions(self, gcHorizon: int = None):
+        # Drop versions no read-only transaction starting at or after gcHorizon
+        # can see (None: no read-only transaction is active).
+        self.store.collectVersions(gcHorizon)
 
     def fail(self, timestamp: int):
         self.is_down = True
+        if self.placement is not None:
+            self.placement.setUp(self.id, False)
         # TODO
         self._revertAllValues()
+        self.writtenVarIds.clear()
         self.lock_manager.clear()
-        if len(self.terminatedIntervals) == 0 or self.terminatedIntervals[-1].isClosed:
-            self.terminatedIntervals.append(Interval(timestamp))
+        self.failureHistory.open(timestamp)
+        # transactions that accessed the site before it failed
+        return set(self.visitedTrxIds)
+
+    def forgetTransactions(self, trxIds):
+        self.visitedTrxIds.difference_update(trxIds)
 
     def recover(self, timestamp: int):
         self.is_down = False
+        if self.placement is not None:
+            self.placement.setUp(self.id, True)
         self.lock_manager.varsWaitingForCommittedWrites.update(self.replicatedVarIds)
-        if len(self.terminatedIntervals) != 0 and self.terminatedIntervals[-1].isClosed:
-            self.terminatedIntervals[-1].endTime = timestamp - 1
+        if self.storage is not None:
+            # committed state comes back from the checkpoint and the log tail
+            self._loadFromStorage()
+        self.failureHistory.close(timestamp - 1)
 
-    def isSiteFailInPeriod(self, startTime: int, endTime: int):
-        for i in range(len(self.terminatedIntervals)):
-            interval = self.terminatedIntervals[i]
-            if interval.endTime < startTime:
+    def stats(self) -> dict:
+        stats = {
+            'up': not self.is_down,
+            'vars': len(self.store),
+            'failures': len(self.failureHistory.startTimes),
+            'visited_txns': len(self.visitedTrxIds),
+        }
+        stats.update(self.lock_manager.stats())
+        return stats
+
+    def varsWaitingForCommittedWrites(self):
+        return sorted(self.lock_manager.varsWaitingForCommittedWrites)
+
+    def exportCommitted(self, varIds):
+        # Latest committed value and commit time of the given variables, as
+        # (varIds, times, values) columns. Variables this site is itself waiting
+        # for a committed write on are left out, its copy may be stale, and so
+        # are write-locked ones: the writer's commit will not reach the
+        # recovering site, which must wait for the next committed write.
+        waiting = self.lock_manager.varsWaitingForCommittedWrites
+        writeLocks = self.lock_manager.writeLocks
+        outIds, times, vals = array('I'), array('q'), array('q')
+        for varId in varIds:
+            if varId in waiting or varId in writeLocks or varId not in self.store:
+                continue
+            outIds.append(varId)
+            times.append(self.store.committedTime(varId))
+            vals.append(self.store.committedValue(varId))
+        return outIds, times, vals
+
+    def installCommitted(self, varIds, times, vals):
+        # Catch-up after recovery: takes the committed versions of a peer and
+        # makes the variables readable again. Returns the variables installed.
+        waiting = self.lock_manager.varsWaitingForCommittedWrites
+        installed = list()
+        for varId, commitTime, val in zip(varIds, times, vals):
+            if varId not in waiting:
                 continue
-            return interval.startTime <= endTime
-        return False
+            self.store.appendVersion(varId, commitTime, val)
+            waiting.discard(varId)
+            installed.append(varId)
+        self.changedVarIds.update(installed)
+        if self.storage is not None and installed:
+            self.storage.checkpoint(self.store.exportVersions())
+        return installed
+
+    def isSiteFailInPeriod(self, startTime: int, endTime: int):
+        return self.failureHistory.overlaps(startTime, endTime)
+
+    def compactFailureHistory(self, horizon: int = None):
+        self.failureHistory.compact(horizon)
+
+    def wasUpAt(self, timestamp: int):
+        return not self.isSiteFailInPeriod(timestamp, timestamp)
 
     def revertValue(self, trxId: int):
-        lockVariables = self.lock_manager.getLockedVariables(trxId)
-        for varId in lockVariables:
-            self.varToCurrVal[varId] = self.varToCommittedVal.get(varId)
+        for varId in self.writtenVarIds.pop(trxId, ()):
+            self.store.revert(varId)
+        self.visitedTrxIds.discard(trxId)
 
     def _revertAllValues(self):
-        self.varToCurrVal = self.varToCommittedVal
+        self.store.revertAll()
+
+    def enableLockStriping(self, numOfStripes: int):
+        # the lock table is shared by the threads of a ParallelExecutor
+        if not isinstance(self.lock_manager, StripedLockManager):
+            self.lock_manager = StripedLockManager.fromLockManager(self.lock_manager, numOfStripes)
+
+    def close(self):
+        if self.storage is not None:
+            self.storage.close()
+
+
+def call_sites(sites, method: str, *args):
+    # Calls the method on every site and returns the results in order. Remote
+    # sites get their request before any reply is awaited, so they work on it
+    # concurrently. Each remote site is locked from its request to its reply;
+    # the sites are always given in id order, so threads calling overlapping
+    # sets of sites take the locks in the same order.
+    locked = list()
+    try:
+        for site in sites:
+            if site.isRemote:
+                site.lock.acquire()
+                locked.append(site)
+                site.sendCall(method, *args)
+        return [site.receiveResult() if site.isRemote else getattr(site, method)(*args) for site in sites]
+    finally:
+        for site in locked:
+            site.lock.release()
+
+
+def call_local_sites(sites, method: str, *args):
+    # call_sites when no site is remote
+    return list(map(methodcaller(method, *args), sites))
+
+
+def pooled_call_sites(pool, methods):
+    # call_sites running the given methods of local sites in a thread pool, one
+    # task per site (a site's state is only touched by its own call)
+    def call(sites, method: str, *args):
+        if method not in methods or len(sites) < 2:
+            return list(map(methodcaller(method, *args), sites))
+        return list(pool.map(methodcaller(method, *args), sites))
+    return call
@@ -1,7 +1,15 @@
 from collections import deque
+import sys
 
-from .constants import Action, TransactionStatus
+from .constants import MAX_VALUE, MIN_VALUE, AbortCause, Action, Event, TransactionStatus
+from .events import EventSink, TextSink
 from .input_parser import Operation, Parser
+from .placement import Placement
+from .site import call_local_sites, call_sites
+from .deadlock import CycleDetection
+from .history import TransactionHistory
+from .scheduler import WakeAll
+from .wait_queue import WaitQueue
 
 class Transaction:
     def __init__(self, start_time: int, id: int) -> None:
@@ -9,16 +17,41 @@ class Transaction:
         self.start_time = start_time
         self.is_read_only = False
         self.status = TransactionStatus.ACTIVE
-        self.data = dict()
+        # footprint: variables read and written, and ids of the sites where the
+        # transaction took locks (the only sites its commit or abort visits)
+        self.readSet = set()
+        self.writeSet = set()
+        self.siteIds = set()
 
 
 class TransactionManager:
-    def __init__(self, idToSites: dict) -> None:
+    def __init__(self, idToSites: dict, placement: Placement = None, events: EventSink = None,
+                 deadlockPolicy=None, scheduler=None, catchUpOnRecover: bool = False) -> None:
         self.pending_operations = deque()
+        # live transactions only, finished ones move to finishedTransactions
         self.idToTransactions = dict()
+        self.finishedTransactions = TransactionHistory()
         self.idToSites = idToSites
-        self.waitingOperations = list()
-        self.waitsForGraph = dict()
+        self.placement = placement if placement is not None else Placement.fromSites(idToSites)
+        self.waitingOperations = WaitQueue()
+        # CycleDetection (default), WaitDie, WoundWait or WaitTimeout
+        self.deadlockPolicy = deadlockPolicy if deadlockPolicy is not None else CycleDetection()
+        # WakeAll (default) or ConditionScheduler, decides when operations on
+        # hold are handled again
+        self.scheduler = scheduler if scheduler is not None else WakeAll()
+        # variable of the operation the scheduler is retrying, the writers
+        # queued on it are behind that operation
+        self.retryingVarId = None
+        # a recovering site copies the committed replicated variables from up
+        # peers instead of waiting for a new committed write on each of them
+        self.catchUpOnRecover = catchUpOnRecover
+        # trxId -> start time of active read-only transactions (bounds version GC)
+        self.activeROTrxs = dict()
+        # sends a request to several sites, concurrently if they run in other processes
+        self.call_sites = call_sites if any(site.isRemote for site in idToSites.values()) else call_local_sites
+        self.events = events if events is not None else TextSink(sys.stdout, autoflush=sys.stdout.isatty())
+        # dbms.metrics.Metrics once attached, hooks below are skipped while None
+        self.metrics = None
 
         self.action_handlers = {
             Action.BEGIN: self.initTransaction,
@@ -29,24 +62,45 @@ class TransactionManager:
             Action.FAIL: self.fail,
             Action.RECOVER: self.recover,
             Action.DUMP: self.dump,
+            Action.DUMP_DIFF: self.dumpDiff,
+            Action.STATS: self.stats,
         }
 
-    def start(self) -> None:
-        parser = Parser()
-        while True:
-            if self.pending_operations:
-                ops_todo = self.pending_operations
-                self.pending_operations = []
-                for pending_op in ops_todo:
-                    self._handle_operation(pending_op)
-            try:
-                op = parser.parse_line()
-            except EOFError:
-                break
-            if not op:
-                continue
-            if op.action in self.action_handlers:
-                self._handle_operation(op)
+    def start(self, operations=None) -> None:
+        # operations: any iterable of Operation, stdin is parsed by default
+        if operations is None:
+            operations = Parser()
+        try:
+            for op in operations:
+                self.step(op)
+            self._run_pending_operations()
+        finally:
+            self.events.close()
+
+    def step(self, op: Operation) -> None:
+        # Operations woken up by the previous instruction run before the next one
+        self._run_pending_operations()
+        if op.action in self.action_handlers:
+            self._handle_operation(op)
+            if op.action != Action.READ and op.action != Action.WRITE:
+                # reads and writes resolve waits themselves, a timed wait can
+                # also expire while other instructions come in
+                self.detect_and_resolve_deadlock(op.timestamp)
+
+    def drain(self) -> None:
+        # Runs woken up operations until none is left (a woken operation that
+        # blocks again goes back to the wait queue, not to the pending ones)
+        while self.pending_operations or self.scheduler.hasWork():
+            self._run_pending_operations()
+
+    def _run_pending_operations(self) -> None:
+        if self.pending_operations:
+            ops_todo = self.pending_operations
+            self.pending_operations = deque()
+            for pending_op in ops_todo:
+                self._handle_operation(pending_op)
+        if self.scheduler.hasWork():
+            self.scheduler.retry(self)
 
     def _handle_operation(self, op: Operation) -> None:
         self.action_handlers[op.action](op)
@@ -54,38 +108,31 @@ class TransactionManager:
     def initTransaction(self, operation: Operation):
         trx = Transaction(operation.timestamp, operation.txn_id)
         self.idToTransactions[trx.id] = trx
-        print('[INFO]', f'T{trx.id} begins')
+        self.finishedTransactions.discard(trx.id)
+        self.events.emit(Event.BEGIN, trx.id)
 
     def initROTransaction(self, operation: Operation):
-        currTime = operation.timestamp
-        trx = Transaction(currTime, operation.txn_id)
+        # Only the start time is recorded, versions are looked up on read
+        trx = Transaction(operation.timestamp, operation.txn_id)
         trx.is_read_only = True
-        
-        data = dict()
-        for site in self.idToSites.values():
-            if site.is_down:
-                continue
-            for varId in site.nonReplicatedVarIds:
-                data[varId] = site.varToCommittedVal.get(varId)
-            
-            for varId in site.replicatedVarIds:
-                committedTime = site.varToCommittedTime.get(varId)
-                if not site.isSiteFailInPeriod(committedTime, currTime) and varId not in data:
-                    data[varId] = site.varToCommittedVal.get(varId)
-        trx.data = data
         self.idToTransactions[trx.id] = trx
-        print('[INFO]', f'T{trx.id} begins as a read-only transaction')
+        self.finishedTransactions.discard(trx.id)
+        self.activeROTrxs[trx.id] = trx.start_time
+        self.events.emit(Event.BEGIN_RO, trx.id)
  
     def readOrWrite(self, operation: Operation):
         trx = self.idToTransactions.get(operation.txn_id)
-        if trx.status == TransactionStatus.ABORTED or trx.status == TransactionStatus.ABORTING:
-            print('[RW_FAIL]', f'T{trx.id} can\'t be executed because it is aborted or will be aborted')
+        if trx is None:
+            self._answer_finished(operation.txn_id, Event.RW_FAIL)
+            return
+        if trx.status == TransactionStatus.ABORTING:
+            self.events.emit(Event.RW_FAIL, trx.id)
             return
         if operation.action == Action.READ:
             self.read(operation)
         elif operation.action == Action.WRITE:
             self.write(operation)
-        self.detect_and_resolve_deadlock()
+        self.detect_and_resolve_deadlock(operation.timestamp)
 
     def read(self, operation: Operation):
         trxId = operation.txn_id
@@ -105,138 +152,161 @@ class TransactionManager:
         varId = operation.var_id
         trx = self.idToTransactions.get(trxId)
 
-        if len(trx.data) != 0 and varId in trx.data:
-            print('[INFO]', f'T{trx.id} reads x{varId}: {trx.data[varId]}')
+        found, readVal = self._read_version(varId, trx.start_time)
+        trx.readSet.add(varId)
+        if found:
+            self.events.emit(Event.READ, trx.id, varId, readVal)
         else:
-            print('[INFO]', f'T{trxId} can\'t read x{varId} because no valid version is available')
-            self.abort(trxId)
+            self.events.emit(Event.RO_READ_FAIL, trxId, varId)
+            self.abort(trxId, AbortCause.NO_VALID_VERSION)
+
+    def _read_version(self, varId, startTime):
+        # A site can serve the snapshot if it was up when the read-only transaction
+        # began and, for a replicated variable, it has not failed between the commit
+        # of the version and the start of the transaction.
+        isReplicated = self.placement.isReplicated(varId)
+        for site in self.placement.sitesHolding(varId):
+            if not site.wasUpAt(startTime):
+                continue
+            version = site.readVersion(varId, startTime)
+            if version is None:
+                continue
+            committedTime, val = version
+            if isReplicated and site.isSiteFailInPeriod(committedTime, startTime):
+                continue
+            return True, val
+        return False, None
 
     def readValue(self, operation: Operation):
         trxId = operation.txn_id
         varId = operation.var_id
         sites = self.getAvailSitesHoldingVarId(varId)
         if not sites:
-            print('[READ_FAIL]', f'T{trxId} can\'t read x{varId} because all sites holding the variable are down')
-            self.abort(trxId)
+            self.events.emit(Event.READ_FAIL, trxId, varId)
+            self.abort(trxId, AbortCause.NO_AVAIL_SITE)
         else:
-            site = sites[0]
+            # a recovered copy of a replicated variable is stale until its next
+            # committed write; canRead made sure some copy is not
+            isReplicated = self.placement.isReplicated(varId)
+            site = next((site for site in sites if not isReplicated
+                         or varId not in site.lock_manager.varsWaitingForCommittedWrites), sites[0])
             readVal = site.readValue(varId, trxId)
-            print('[INFO]', f'T{trxId} reads x{varId}: {readVal}')
+            self.idToTransactions[trxId].readSet.add(varId)
+            self.events.emit(Event.READ, trxId, varId, readVal)
 
     def canRead(self, varId, trxId):
         sites = self.getAvailSitesHoldingVarId(varId)
-        if not sites:
+        if not sites or (self.waitingOperations.hasWriter(varId) and varId != self.retryingVarId):
             return False
         canRead = False
+        isReplicated = self.placement.isReplicated(varId)
         for site in sites:
             lockManager = site.lock_manager
             if not lockManager.canRead(varId, trxId):
                 return False
-            for op in self.waitingOperations:
-                if op.var_id == varId and op.action == Action.WRITE:
-                    return False
-            if varId in site.nonReplicatedVarIds or (varId in site.replicatedVarIds and varId not in site.lock_manager.varsWaitingForCommittedWrites):
+            if not isReplicated or varId not in lockManager.varsWaitingForCommittedWrites:
                 canRead = True
         return canRead
 
     def _addReadLock(self, varId, trxId):
+        siteIds = self.idToTransactions[trxId].siteIds
         for site in self.getAvailSitesHoldingVarId(varId):
             site.lock_manager.addReadLock(varId, trxId)
+            siteIds.add(site.id)
 
     def write(self, operation: Operation):
         trxId = operation.txn_id
         varId = operation.var_id
         writeToVal = operation.var_val
+        if not MIN_VALUE <= writeToVal <= MAX_VALUE:
+            # rejected before any copy is written, the transaction goes on
+            self.events.emit(Event.VALUE_OUT_OF_RANGE, trxId, varId, writeToVal)
+            return
         if self.canWrite(varId, trxId):
             # print("[OK_TO_WRITE]", operation)
             self._addWriteLock(varId, trxId)
             self._writeValue(varId, writeToVal, trxId)
             self._print_write_intent(operation)
         else:
-            print("[WRITE_ON_HOLD]", operation)
+            self.events.emit(Event.WRITE_ON_HOLD, operation)
             self.putOperationOnHold(operation)
 
     def _writeValue(self, varId, writeToVal, trxId):
-        for site in self.getAvailSitesHoldingVarId(varId):
-            site.writeValue(varId, writeToVal, trxId)
+        self.idToTransactions[trxId].writeSet.add(varId)
+        self.call_sites(self.getAvailSitesHoldingVarId(varId), 'writeValue', varId, writeToVal, trxId)
 
     def _print_write_intent(self, operation: Operation):
         trxId = operation.txn_id
         varId = operation.var_id
         writeToVal = operation.var_val
-        sb = f'T{trxId} writes x{varId}: {writeToVal} to site(s): '
         site_ids = [s.id for s in self.getAvailSitesHoldingVarId(varId)]
-        sb += ' '.join([str(sid) for sid in sorted(site_ids)])
-        print('[INFO]', sb)
+        self.events.emit(Event.WRITE, trxId, varId, writeToVal, site_ids)
 
     def canWrite(self, varId, trxId):
         sites = self.getAvailSitesHoldingVarId(varId)
-        if not sites:
+        if not sites or (self.waitingOperations.hasWriter(varId) and varId != self.retryingVarId):
             return False
         for site in sites:
             if not site.lock_manager.canWrite(varId, trxId):
                 return False
-            for op in self.waitingOperations:
-                if op.var_id == varId and op.action == Action.WRITE:
-                    return False
         return True
 
     def _addWriteLock(self, varId, trxId):
-        for site in self.getAvailSitesHoldingVarId(varId):
-            site.lock_manager.addWriteLock(varId, trxId)
+        sites = self.getAvailSitesHoldingVarId(varId)
+        self.idToTransactions[trxId].siteIds.update(site.id for site in sites)
+        self.call_sites(sites, 'addWriteLock', varId, trxId)
 
     def putOperationOnHold(self, operation: Operation):
         trxId = operation.txn_id
         varId = operation.var_id
         availSites = self.getAvailSitesHoldingVarId(varId)
+        if self.metrics is not None:
+            self.metrics.opBlocked(operation)
 
         # (1) no site is available
         if not availSites:
             self.waitingOperations.append(operation)
-            print('[NO_AVAIL_SITE]', f'T{trxId} waits because all sites holding the variable are down')
+            self.events.emit(Event.NO_AVAIL_SITE, trxId)
             return
 
         # (2) operation in the recovered site which waiting for committed write
         if operation.action == Action.READ:
             for site in availSites:
                 if varId in site.lock_manager.varsWaitingForCommittedWrites:
-                    print('[WAIT_FOR_COMMIT]', f'T{trxId} waits because x{varId} is waiting for committed write at site {site.id}')
+                    self.events.emit(Event.WAIT_FOR_COMMIT, trxId, varId, site.id)
                     break
         
-        # (3) operation should execute after some of waiting operations
-        shouldWait = False
-        for site in availSites:
-            lockManager = site.lock_manager
-            if shouldWait or (not lockManager.canRead(varId, trxId) and not lockManager.canWrite(varId, trxId)):
-                break
-            for op in self.waitingOperations:
-                if op.var_id == varId and op.action == Action.WRITE:
-                    if op.txn_id not in self.waitsForGraph:
-                        self.waitsForGraph[op.txn_id] = set()
-                    self.waitsForGraph[op.txn_id].add(trxId)
-                    print('[ON_HOLD_WAIT]', f'T{trxId} waits because it cannot skip T{op.txn_id}')
-                    shouldWait = True
-                    break
+        # (3) operation should execute after some of waiting operations (i.e. the
+        # variable is not locked on some available site but a write is queued on it)
+        if self._has_free_site(varId, trxId, availSites):
+            op = self.waitingOperations.firstWriter(varId, trxId)
+            if op is not None:
+                self._add_wait_edge(op.txn_id, trxId)
+                self.events.emit(Event.ON_HOLD_WAIT, trxId, op.txn_id)
         # (4) operation is on hold because of lock conflict
         self.waitingOperations.append(operation)
         locked = False
         lockHolders = self._getLockHolders(operation)
         if lockHolders:
             for lockedId in lockHolders:
-                if lockedId not in self.waitsForGraph:
-                    self.waitsForGraph[lockedId] = set()
-                self.waitsForGraph[lockedId].add(trxId)
+                self._add_wait_edge(lockedId, trxId)
                 locked = True
         if locked:
-            print('[LOCK_CONFLICT]', f'T{trxId} waits for T{lockHolders}')
+            self.events.emit(Event.LOCK_CONFLICT, trxId, lockHolders)
         # self.print_wait_graph()
 
+    def _has_free_site(self, varId, trxId, availSites):
+        for site in availSites:
+            lockManager = site.lock_manager
+            if lockManager.canRead(varId, trxId) or lockManager.canWrite(varId, trxId):
+                return True
+        return False
+
+    def _add_wait_edge(self, holderId, waiterId):
+        self.deadlockPolicy.addWait(holderId, waiterId)
+
     def getAvailSitesHoldingVarId(self, varId):
-        ret = set()
-        for site in self.idToSites.values():
-            if not site.is_down and (varId in site.replicatedVarIds or varId in site.nonReplicatedVarIds):
-                ret.add(site)
-        return list(ret)
+        return self.placement.availSitesHolding(varId)
 
     def _getLockHolders(self, operation: Operation):
         lockHolders = set()
@@ -244,179 +314,242 @@ class TransactionManager:
         txn_id = operation.txn_id
         sites = self.getAvailSitesHoldingVarId(varId)
         for site in sites:
-            lockManager = site.lock_manager
-            readLocks = lockManager.readLocks
-            writeLocks = lockManager.writeLocks
+            lockHolders.update(site.lock_manager.getLockHolders(varId))
 
-            if varId in readLocks:
-                lockHolders.update(readLocks[varId])
-            if varId in writeLocks:
-                lockHolders.add(writeLocks[varId])
-
-        if txn_id in lockHolders:
-            lockHolders.remove(txn_id)
+        lockHolders.discard(txn_id)
         return lockHolders
 
-    def detect_and_resolve_deadlock(self):
-        for trxId in self.idToTransactions.keys():
-            visited = set()
-            if self._has_cycle(trxId, visited):
-                self._abort_youngest_txn(visited)
-                return
-                
-    def _has_cycle(self, currTrxId, visited):
-        if currTrxId in visited:
-            return True
-        if currTrxId not in self.waitsForGraph:
-            return False
-        visited.add(currTrxId)
-        for waitingTrxId in self.waitsForGraph[currTrxId]:
-            if self._has_cycle(waitingTrxId, visited):
-                return True
-        visited.remove(currTrxId)
-        return False
+    def detect_and_resolve_deadlock(self, timestamp=None):
+        if self.deadlockPolicy.hasWork():
+            self.deadlockPolicy.resolve(self, timestamp)
 
-    def _abort_youngest_txn(self, visited):
+    def isLive(self, trx: Transaction):
+        return trx.status in (TransactionStatus.ACTIVE, TransactionStatus.ABORTING)
+
+    def abortVictim(self, trxId, cause: AbortCause, event: Event, *args):
+        self.events.emit(event, *args)
+        self.abort(trxId, cause)
+
+    def _abort_youngest_txn(self, cycle):
         youngestTrxId = -1
         largestTime = -1
-        for trxId in visited:
+        for trxId in cycle:
             trx = self.idToTransactions.get(trxId)
             if trx.start_time > largestTime:
                 largestTime = trx.start_time
                 youngestTrxId = trxId
-        print('[DEADLOCK_DETECTED]', f'kill youngest transaction T{youngestTrxId}')
-        self.abort(youngestTrxId)
+        self.events.emit(Event.DEADLOCK_DETECTED, youngestTrxId)
+        self.abort(youngestTrxId, AbortCause.DEADLOCK)
 
     def end(self, operation: Operation):
         trxId = operation.txn_id
         currTime = operation.timestamp
         trx = self.idToTransactions.get(trxId)
-        if trx.status == TransactionStatus.ABORTED:
+        if trx is None:
+            self._answer_finished(trxId, None)
             return
         if trx.status == TransactionStatus.ABORTING:
-            self.abort(trxId)
+            self.abort(trxId, AbortCause.SITE_FAILURE)
             return
         self.commit(trxId, currTime)
 
+    def _answer_finished(self, trxId, abortedEvent):
+        # Instruction naming a transaction that is no longer live: an aborted
+        # one is answered with abortedEvent (None: silently ignored)
+        outcome = self.finishedTransactions.outcome(trxId)
+        if outcome is None:
+            self.events.emit(Event.UNKNOWN_TXN, trxId)
+        elif outcome:
+            self.events.emit(Event.TXN_FINISHED, trxId)
+        elif abortedEvent is not None:
+            self.events.emit(abortedEvent, trxId)
+
     def commit(self, trxId, currTime):
         trx = self.idToTransactions.get(trxId)
         trx.status = TransactionStatus.COMMITTED
         self.commit_or_abort(trxId, True, currTime)
-        print('[INFO]', f'T{trxId} commits')
+        self._retire(trx)
+        self.events.emit(Event.COMMIT, trxId)
 
-    def abort(self, trxId):
+    def abort(self, trxId, cause: AbortCause = None):
         trx = self.idToTransactions.get(trxId)
         trx.status = TransactionStatus.ABORTED
+        if self.metrics is not None:
+            self.metrics.aborted(trxId, cause)
         self.commit_or_abort(trxId, False, None)
-        print('[INFO]', f'T{trxId} aborts')
+        self._retire(trx)
+        self.events.emit(Event.ABORT, trxId)
+
+    def _retire(self, trx: Transaction):
+        # Only the outcome is kept once the sites have committed or reverted the
+        # transaction and released its locks
+        del self.idToTransactions[trx.id]
+        self.finishedTransactions.record(trx.id, trx.status == TransactionStatus.COMMITTED)
     
     def commit_or_abort(self, trxId, shouldCommit, currTime):
         if shouldCommit and currTime == None:
             return
         
-        # (1) Remove transaction in waitsForGraph
+        # (1) Remove transaction from the waits kept by the deadlock policy
         self._remove_from_wait_graph(trxId)
-        temp = []
-        for op in self.waitingOperations:
-            if op.txn_id == trxId:
-                temp.append(op)
-        
-        # (2) Remove transaction in waiting operation
-        for op in temp:
-            self.waitingOperations.remove(op)
-        del temp
 
+        # (2) Remove transaction in waiting operation, operations queued behind
+        # them may be able to run now
+        removedOps = self.waitingOperations.removeTransaction(trxId)
+        if self.metrics is not None and removedOps:
+            self.metrics.waitsAbandoned(removedOps)
+
+        # only the sites the transaction took locks at hold its writes and locks
+        sites = self._touched_sites(trxId)
         committedWrittenVarIds = set()
         if shouldCommit:
-            self._commit_value(trxId, currTime, committedWrittenVarIds)
+            self._commit_value(trxId, currTime, committedWrittenVarIds, sites)
         else:
-            self._revert_value(trxId)
-        
-        lockedVarIds = self._get_locked_vars(trxId)
-        lockedVarIds.update(committedWrittenVarIds)
+            self._revert_value(trxId, sites)
+
         # (3) release transaction's locks
-        self._release_all_locks(trxId)
+        lockedVarIds = self._release_all_locks(trxId, sites)
+        lockedVarIds.update(committedWrittenVarIds)
+        # operations queued behind the dropped ones would otherwise wait until
+        # some other transaction happens to release a lock on the variable
+        lockedVarIds.update(op.var_id for op in removedOps)
         # (4) wake up waiting operations
         self._wake_up_waiting_ops(lockedVarIds)
+        # (5) old versions may no longer be visible to any read-only transaction
+        if self.activeROTrxs.pop(trxId, None) is not None:
+            self._collect_versions()
 
     def _wake_up_waiting_ops(self, lockedVarIds):
-        opsToWakeUp = deque()
-        for lockedVarId in lockedVarIds:
-            for op in self.waitingOperations:
-                if op.var_id == lockedVarId and op not in opsToWakeUp:
-                    opsToWakeUp.append(op)
-        if not opsToWakeUp:
-            return
-        for op in opsToWakeUp:
-            print('[WAKE_UP_OP]', op)
-            self.waitingOperations.remove(op)
-            self.pending_operations.append(op)
-        
+        self.scheduler.varsReleased(self, lockedVarIds)
+
     def _remove_from_wait_graph(self, trxId):
-        emptyTrx = list()
-        for key, value in self.waitsForGraph.items():
-            if trxId in value:
-                value.remove(trxId)
-            if len(value) == 0:
-                emptyTrx.append(key)
-        for key in emptyTrx:
-            self.waitsForGraph.pop(key, None)
-        self.waitsForGraph.pop(trxId, None)
-        # self.printWaitsForGraph()
-
-    def _get_locked_vars(self, trxId):
-        lockVariable = set()
-        for site in self.idToSites.values():
-            lockVariable.update(site.lock_manager.getLockedVariables(trxId))
-        return lockVariable
-
-    def _release_all_locks(self, trxId):
-        for site in self.idToSites.values():
-            site.lock_manager.releaseAllLocks(trxId)
-
-    def _commit_value(self, txn_id, currTime, committedWrittenVarIds):
-        for site in self.idToSites.values():
-            committedWrittenVarIds.update(site.writtenVarIds)
-            site.commitValue(txn_id, currTime)
-
-    def _revert_value(self, trxId):
-        for site in self.idToSites.values():
-            site.revertValue(trxId)
+        self.deadlockPolicy.removeTransaction(trxId)
+
+    def _touched_sites(self, trxId):
+        trx = self.idToTransactions.get(trxId)
+        if trx is None or not trx.siteIds:
+            return []
+        return [self.idToSites[siteId] for siteId in sorted(trx.siteIds)]
+
+    def _release_all_locks(self, trxId, sites):
+        # Returns the variables that were locked
+        lockedVarIds = set()
+        for releasedVarIds in self.call_sites(sites, 'releaseAllLocks', trxId):
+            lockedVarIds.update(releasedVarIds)
+        return lockedVarIds
+
+    def _commit_value(self, txn_id, currTime, committedWrittenVarIds, sites):
+        gcHorizon = self._version_gc_horizon()
+        for writtenVarIds in self.call_sites(sites, 'commitValue', txn_id, currTime, gcHorizon):
+            committedWrittenVarIds.update(writtenVarIds)
+
+    def _version_gc_horizon(self):
+        if not self.activeROTrxs:
+            return None
+        return min(self.activeROTrxs.values())
+
+    def _collect_versions(self):
+        gcHorizon = self._version_gc_horizon()
+        sites = self.idToSites.values()
+        self.call_sites(sites, 'collectVersions', gcHorizon)
+        self.call_sites(sites, 'compactFailureHistory', gcHorizon)
+
+    def _revert_value(self, trxId, sites):
+        self.call_sites(sites, 'revertValue', trxId)
 
     def fail(self, operation: Operation):
         siteId = operation.site_id
         currTime = operation.timestamp
 
         site = self.idToSites.get(siteId)
-        site.fail(currTime)
+        visitedTrxIds = site.fail(currTime)
         affected_txns = []
-        for trx in self.idToTransactions.values():
-            if trx.id in site.visitedTrxIds:
-                if trx.status == TransactionStatus.ABORTED:
-                    # txn already aborted
-                    site.visitedTrxIds.remove(trx.id)
-                else:
-                    trx.status = TransactionStatus.ABORTING
-                    affected_txns.append(trx.id)
-        print('[INFO]', f'Site {siteId} is down')
+        finished_txns = []
+        visited = []
+        for trxId in visitedTrxIds:
+            trx = self.idToTransactions.get(trxId)
+            if trx is None:
+                finished_txns.append(trxId)
+            else:
+                visited.append(trx)
+        # only the live transactions that visited the site, in the order they began
+        visited.sort(key=lambda trx: trx.start_time)
+        for trx in visited:
+            trx.status = TransactionStatus.ABORTING
+            affected_txns.append(trx.id)
+        if finished_txns:
+            site.forgetTransactions(finished_txns)
+        self.events.emit(Event.SITE_DOWN, siteId)
         if affected_txns:
-            print('[AFFECTED_TXNS]', f'T{affected_txns} should abort')
+            self.events.emit(Event.AFFECTED_TXNS, affected_txns)
+        self.scheduler.siteChanged(self, siteId)
 
     def recover(self, operation):
         siteId = operation.site_id
         site = self.idToSites.get(siteId)
         site.recover(operation.timestamp)
-        print('[INFO]', f'Site {siteId} recovers')
+        site.compactFailureHistory(self._version_gc_horizon())
+        self.events.emit(Event.SITE_RECOVER, siteId)
+        if self.catchUpOnRecover:
+            self._catch_up(site)
+        self.scheduler.siteChanged(self, siteId)
+
+    def _catch_up(self, site):
+        # One bulk request per peer, the next peer is asked only for the
+        # variables the previous ones could not provide (they were recovering too)
+        remaining = site.varsWaitingForCommittedWrites()
+        installedVarIds = list()
+        peerIds = list()
+        for peer in self.idToSites.values():
+            if not remaining:
+                break
+            if peer is site or not self.placement.isUp(peer.id):
+                continue
+            installed = site.installCommitted(*peer.exportCommitted(remaining))
+            if installed:
+                peerIds.append(peer.id)
+                installedVarIds.extend(installed)
+                installedSet = set(installed)
+                remaining = [varId for varId in remaining if varId not in installedSet]
+        if installedVarIds:
+            self.events.emit(Event.CATCH_UP, site.id, len(installedVarIds), peerIds)
+            # reads waiting for a committed write on these variables can run
+            self._wake_up_waiting_ops(installedVarIds)
 
     def dump(self, operation):
-        for site in self.idToSites.values():
-            varToCommittedVal = site.varToCommittedVal
-            sb = ""
-            delim = ''
-            for varId in range(1, 21):
-                if varId not in varToCommittedVal:
-                    continue
-                sb += delim + 'x' + str(varId) + ': ' + str(varToCommittedVal.get(varId))
-                delim = ', '
-            print(f'site {site.id} - {sb}')
-    
+        varId = operation.var_id
+        if varId is not None:
+            for site in self.placement.sitesHolding(varId):
+                self.events.emit(Event.DUMP_SITE, site.id, [(varId, site.committedValue(varId))])
+            return
+        if operation.site_id is not None:
+            site = self.idToSites.get(operation.site_id)
+            sites = (site,) if site is not None else ()
+        else:
+            sites = self.idToSites.values()
+        for site in sites:
+            self.events.emit(Event.DUMP_SITE, site.id, site.committedValues())
+
+    def dumpDiff(self, operation):
+        # Only the sites with committed writes since the previous dump(diff)
+        sites = list(self.idToSites.values())
+        for site, changed in zip(sites, self.call_sites(sites, 'takeChangedValues')):
+            if changed:
+                self.events.emit(Event.DUMP_SITE, site.id, changed)
+
+    def stats(self, operation):
+        self.events.emit(Event.STATS, self.collectStats())
+
+    def collectStats(self) -> dict:
+        return {
+            'transactions': {
+                'active': len(self.idToTransactions),
+                'read_only_active': len(self.activeROTrxs),
+                'finished': self.finishedTransactions.stats(),
+            },
+            'waiting_ops': len(self.waitingOperations),
+            'deadlock_policy': self.deadlockPolicy.name,
+            'scheduler': self.scheduler.name,
+            'sites': {str(site.id): site.stats() for site in self.idToSites.values()},
+            'metrics': self.metrics.snapshot() if self.metrics is not None else None,
+        }
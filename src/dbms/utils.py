@@ -1,5 +1,65 @@
+from bisect import bisect_left
+import threading
+
 class Interval:
     def __init__(self, startTime: int) -> None:
         self.startTime = startTime
         self.isClosed = False
-        self.endTime = -1
\ No newline at end of file
+        self.endTime = -1
+
+
+class FailureHistory:
+    # Disjoint failure intervals of a site in time order, kept as parallel
+    # sorted lists of start and end times. An interval that has not been closed
+    # yet (the site is still down) ends at OPEN_END.
+    OPEN_END = float('inf')
+
+    def __init__(self) -> None:
+        self.startTimes = list()
+        self.endTimes = list()
+
+    def open(self, startTime: int) -> None:
+        if self.isOpen():
+            return
+        self.startTimes.append(startTime)
+        self.endTimes.append(self.OPEN_END)
+
+    def close(self, endTime: int) -> None:
+        if self.isOpen():
+            self.endTimes[-1] = endTime
+
+    def isOpen(self) -> bool:
+        return len(self.endTimes) != 0 and self.endTimes[-1] == self.OPEN_END
+
+    def overlaps(self, startTime: int, endTime: int) -> bool:
+        # the first interval ending at or after startTime is the only candidate
+        idx = bisect_left(self.endTimes, startTime)
+        return idx < len(self.startTimes) and self.startTimes[idx] <= endTime
+
+    def compact(self, horizon: int = None) -> None:
+        # Queries only ask about periods ending at or after horizon, so every
+        # closed interval ending before it can be merged into one: such a query
+        # overlaps one of them iff it overlaps the merged interval.
+        # horizon=None merges all closed intervals.
+        if horizon is None:
+            idx = len(self.endTimes) - 1 if self.isOpen() else len(self.endTimes)
+        else:
+            idx = bisect_left(self.endTimes, horizon)
+        if idx <= 1:
+            return
+        self.endTimes[0] = self.endTimes[idx - 1]
+        del self.startTimes[1:idx]
+        del self.endTimes[1:idx]
+
+    def __len__(self):
+        return len(self.startTimes)
+
+
+class StripedLocks:
+    # Fixed pool of mutexes, key k is guarded by lock k mod n: threads working
+    # on different keys rarely contend and no mutex is kept per key
+    def __init__(self, numOfStripes: int = 64) -> None:
+        self.locks = [threading.Lock() for _ in range(numOfStripes)]
+
+    def lockFor(self, key):
+        return self.locks[hash(key) % len(self.locks)]
@@ -0,0 +1,313 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Storage of a site's variables: committed value and commit time, the
+# uncommitted values written by transactions holding write locks, and the
+# older committed versions still visible to read-only transactions.
+#
+# Versions are exchanged with checkpoints as four columns:
+#   varIds (ascending), number of versions per variable, then the commit times
+#   and values of every chain, oldest first.
+
+class DictVarStore:
+    def __init__(self) -> None:
+        self.committedVals = dict()
+        self.committedTimes = dict()
+        self.uncommitted = dict()
+        # varId -> ([commit times], [values]), append-only and ordered by commit
+        # time, the last entry is the committed version
+        self.versions = dict()
+        # variables whose chain holds more than the latest version
+        self.multiVersionVarIds = set()
+
+    def addVar(self, varId: int, val: int, commitTime: int = 0):
+        self.committedVals[varId] = val
+        self.committedTimes[varId] = commitTime
+        self.versions[varId] = ([commitTime], [val])
+
+    def __contains__(self, varId):
+        return varId in self.committedVals
+
+    def __len__(self):
+        return len(self.committedVals)
+
+    def read(self, varId: int):
+        if varId in self.uncommitted:
+            return self.uncommitted[varId]
+        return self.committedVals.get(varId)
+
+    def write(self, varId: int, val: int):
+        self.uncommitted[varId] = val
+
+    def commit(self, varId: int, commitTime: int):
+        val = self.uncommitted.pop(varId, self.committedVals.get(varId))
+        self.committedVals[varId] = val
+        self.committedTimes[varId] = commitTime
+        times, vals = self.versions[varId]
+        times.append(commitTime)
+        vals.append(val)
+        self.multiVersionVarIds.add(varId)
+        return val
+
+    def revert(self, varId: int):
+        self.uncommitted.pop(varId, None)
+
+    def revertAll(self):
+        self.uncommitted.clear()
+
+    def committedValue(self, varId: int):
+        return self.committedVals.get(varId)
+
+    def committedTime(self, varId: int):
+        return self.committedTimes.get(varId)
+
+    def committedItems(self):
+        return sorted(self.committedVals.items())
+
+    def lastCommitTime(self):
+        return max(self.committedTimes.values(), default=0)
+
+    def readVersion(self, varId: int, timestamp: int):
+        versions = self.versions.get(varId)
+        if versions is None:
+            return None
+        times, vals = versions
+        idx = bisect_right(times, timestamp) - 1
+        if idx < 0:
+            return None
+        return times[idx], vals[idx]
+
+    def pruneVersions(self, varId: int, gcHorizon: int):
+        times, vals = self.versions[varId]
+        if gcHorizon is None:
+            idx = len(times) - 1
+        else:
+            idx = bisect_right(times, gcHorizon) - 1
+        if idx > 0:
+            del times[:idx]
+            del vals[:idx]
+        if len(times) == 1:
+            self.multiVersionVarIds.discard(varId)
+
+    def collectVersions(self, gcHorizon: int = None):
+        for varId in list(self.multiVersionVarIds):
+            self.pruneVersions(varId, gcHorizon)
+
+    def appendVersion(self, varId: int, commitTime: int, val: int):
+        # Used when replaying a log, versions at or before the latest are skipped
+        if varId not in self.versions:
+            self.addVar(varId, val, commitTime)
+            return
+        if self.committedTimes[varId] >= commitTime:
+            return
+        self.uncommitted[varId] = val
+        self.commit(varId, commitTime)
+
+    def exportVersions(self):
+        varIds, counts, times, vals = array('I'), array('I'), array('q'), array('q')
+        for varId in sorted(self.versions):
+            chainTimes, chainVals = self.versions[varId]
+            varIds.append(varId)
+            counts.append(len(chainTimes))
+            times.extend(chainTimes)
+            vals.extend(chainVals)
+        return varIds, counts, times, vals
+
+    def importVersions(self, varIds, counts, times, vals):
+        self.__init__()
+        if len(times) == len(varIds):
+            # a single version per variable
+            self.committedVals = dict(zip(varIds, vals))
+            self.committedTimes = dict(zip(varIds, times))
+            self.versions = {varId: ([commitTime], [val]) for varId, commitTime, val in zip(varIds, times, vals)}
+            return
+        offset = 0
+        for varId, count in zip(varIds, counts):
+            chainTimes = list(times[offset:offset + count])
+            chainVals = list(vals[offset:offset + count])
+            offset += count
+            self.versions[varId] = (chainTimes, chainVals)
+            self.committedVals[varId] = chainVals[-1]
+            self.committedTimes[varId] = chainTimes[-1]
+            if count > 1:
+                self.multiVersionVarIds.add(varId)
+
+
+class ColumnarVarStore:
+    # Dense columns indexed by the position of the variable in the sorted varIds
+    # array. Uncommitted writes live in a sparse overlay, so reverting every
+    # uncommitted value is a clear() and dump/checkpoints are column copies.
+    def __init__(self) -> None:
+        self.varIds = array('I')
+        self.committedVals = array('q')
+        self.committedTimes = array('q')
+        # index -> uncommitted value
+        self.uncommitted = dict()
+        # index -> ([commit times], [values]) of versions older than the committed one
+        self.olderVersions = dict()
+
+    def _index(self, varId: int):
+        idx = bisect_left(self.varIds, varId)
+        if idx < len(self.varIds) and self.varIds[idx] == varId:
+            return idx
+        return -1
+
+    def addVar(self, varId: int, val: int, commitTime: int = 0):
+        if not self.varIds or self.varIds[-1] < varId:
+            self.varIds.append(varId)
+            self.committedVals.append(val)
+            self.committedTimes.append(commitTime)
+            return
+        idx = bisect_left(self.varIds, varId)
+        if idx < len(self.varIds) and self.varIds[idx] == varId:
+            self.committedVals[idx] = val
+            self.committedTimes[idx] = commitTime
+            return
+        # out of order registration shifts the indexes after idx
+        self.varIds.insert(idx, varId)
+        self.committedVals.insert(idx, val)
+        self.committedTimes.insert(idx, commitTime)
+        self.uncommitted = {i + (i >= idx): v for i, v in self.uncommitted.items()}
+        self.olderVersions = {i + (i >= idx): v for i, v in self.olderVersions.items()}
+
+    def __contains__(self, varId):
+        return self._index(varId) >= 0
+
+    def __len__(self):
+        return len(self.varIds)
+
+    def read(self, varId: int):
+        idx = self._index(varId)
+        if idx < 0:
+            return None
+        if idx in self.uncommitted:
+            return self.uncommitted[idx]
+        return self.committedVals[idx]
+
+    def write(self, varId: int, val: int):
+        idx = self._index(varId)
+        if idx >= 0:
+            self.uncommitted[idx] = val
+
+    def commit(self, varId: int, commitTime: int):
+        idx = self._index(varId)
+        val = self.uncommitted.pop(idx, self.committedVals[idx])
+        older = self.olderVersions.get(idx)
+        if older is None:
+            older = self.olderVersions[idx] = ([], [])
+        older[0].append(self.committedTimes[idx])
+        older[1].append(self.committedVals[idx])
+        self.committedVals[idx] = val
+        self.committedTimes[idx] = commitTime
+        return val
+
+    def revert(self, varId: int):
+        self.uncommitted.pop(self._index(varId), None)
+
+    def revertAll(self):
+        self.uncommitted.clear()
+
+    def committedValue(self, varId: int):
+        idx = self._index(varId)
+        return self.committedVals[idx] if idx >= 0 else None
+
+    def committedTime(self, varId: int):
+        idx = self._index(varId)
+        return self.committedTimes[idx] if idx >= 0 else None
+
+    def committedItems(self):
+        return list(zip(self.varIds, self.committedVals))
+
+    def lastCommitTime(self):
+        return max(self.committedTimes, default=0)
+
+    def readVersion(self, varId: int, timestamp: int):
+        idx = self._index(varId)
+        if idx < 0:
+            return None
+        if self.committedTimes[idx] <= timestamp:
+            return self.committedTimes[idx], self.committedVals[idx]
+        older = self.olderVersions.get(idx)
+        if older is None:
+            return None
+        times, vals = older
+        pos = bisect_right(times, timestamp) - 1
+        if pos < 0:
+            return None
+        return times[pos], vals[pos]
+
+    def pruneVersions(self, varId: int, gcHorizon: int):
+        self._pruneIndex(self._index(varId), gcHorizon)
+
+    def _pruneIndex(self, idx: int, gcHorizon: int):
+        older = self.olderVersions.get(idx)
+        if older is None:
+            return
+        times, vals = older
+        if gcHorizon is None or self.committedTimes[idx] <= gcHorizon:
+            pos = len(times)
+        else:
+            pos = bisect_right(times, gcHorizon) - 1
+        if pos > 0:
+            del times[:pos]
+            del vals[:pos]
+        if not times:
+            del self.olderVersions[idx]
+
+    def collectVersions(self, gcHorizon: int = None):
+        if gcHorizon is None:
+            self.olderVersions.clear()
+            return
+        for idx in list(self.olderVersions):
+            self._pruneIndex(idx, gcHorizon)
+
+    def appendVersion(self, varId: int, commitTime: int, val: int):
+        idx = self._index(varId)
+        if idx < 0:
+            self.addVar(varId, val, commitTime)
+            return
+        if self.committedTimes[idx] >= commitTime:
+            return
+        self.uncommitted[idx] = val
+        self.commit(varId, commitTime)
+
+    def exportVersions(self):
+        n = len(self.varIds)
+        if not self.olderVersions:
+            return array('I', self.varIds), array('I', [1]) * n, array('q', self.committedTimes), \
+                array('q', self.committedVals)
+        counts, times, vals = array('I'), array('q'), array('q')
+        for idx in range(n):
+            older = self.olderVersions.get(idx)
+            if older is None:
+                counts.append(1)
+            else:
+                counts.append(1 + len(older[0]))
+                times.extend(older[0])
+                vals.extend(older[1])
+            times.append(self.committedTimes[idx])
+            vals.append(self.committedVals[idx])
+        return array('I', self.varIds), counts, times, vals
+
+    def importVersions(self, varIds, counts, times, vals):
+        self.__init__()
+        self.varIds = array('I', varIds)
+        if len(times) == len(varIds):
+            # a single version per variable
+            self.committedTimes = array('q', times)
+            self.committedVals = array('q', vals)
+            return
+        offset = 0
+        for idx, count in enumerate(counts):
+            last = offset + count - 1
+            self.committedTimes.append(times[last])
+            self.committedVals.append(vals[last])
+            if count > 1:
+                self.olderVersions[idx] = (list(times[offset:last]), list(vals[offset:last]))
+            offset += count
+
+
+STORES = {
+    'dict': DictVarStore,
+    'columnar': ColumnarVarStore,
+}
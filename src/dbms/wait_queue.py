@@ -0,0 +1,73 @@
+from .constants import Action
+
+class WaitQueue:
+    # Blocked operations indexed by variable and by transaction. Dicts are used as
+    # insertion ordered sets, so every per-variable queue stays FIFO and removal
+    # of a single operation is O(1).
+    def __init__(self) -> None:
+        self.varToOps = dict()
+        self.varToWriters = dict()
+        self.trxToOps = dict()
+        self.size = 0
+
+    def append(self, op):
+        self.varToOps.setdefault(op.var_id, dict())[op] = None
+        if op.action == Action.WRITE:
+            self.varToWriters.setdefault(op.var_id, dict())[op] = None
+        self.trxToOps.setdefault(op.txn_id, dict())[op] = None
+        self.size += 1
+
+    def remove(self, op):
+        ops = self.varToOps.get(op.var_id)
+        if ops is None or op not in ops:
+            return False
+        self._discard(self.varToOps, op.var_id, op)
+        if op.action == Action.WRITE:
+            self._discard(self.varToWriters, op.var_id, op)
+        self._discard(self.trxToOps, op.txn_id, op)
+        self.size -= 1
+        return True
+
+    def hasWriter(self, varId):
+        return varId in self.varToWriters
+
+    def firstWriter(self, varId, exceptTrxId=None):
+        # first write queued on the variable by another transaction than exceptTrxId
+        for op in self.varToWriters.get(varId, ()):
+            if op.txn_id != exceptTrxId:
+                return op
+        return None
+
+    def opsOn(self, varId):
+        return list(self.varToOps.get(varId, ()))
+
+    def opsOf(self, trxId):
+        return list(self.trxToOps.get(trxId, ()))
+
+    def hasOpsOn(self, varId):
+        return varId in self.varToOps
+
+    def waitingVarIds(self):
+        return list(self.varToOps)
+
+    def hasOpsOf(self, trxId):
+        return trxId in self.trxToOps
+
+    def removeTransaction(self, trxId):
+        ops = self.opsOf(trxId)
+        for op in ops:
+            self.remove(op)
+        return ops
+
+    def __contains__(self, op):
+        return op in self.varToOps.get(op.var_id, ())
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def _discard(index, key, op):
+        ops = index[key]
+        del ops[op]
+        if not ops:
+            del index[key]
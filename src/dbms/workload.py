@@ -0,0 +1,87 @@
+import random
+from itertools import accumulate
+
+# Seeded generator of traces in the input grammar
+# (begin/beginRO/R/W/end/fail/recover/dump).
+class WorkloadGenerator:
+    def __init__(self, seed: int = 0, numOfTxns: int = 1000, numOfVars: int = 20, numOfSites: int = 10,
+                 concurrency: int = 8, opsPerTxn: int = 5, readRatio: float = 0.5, zipfS: float = 0.0,
+                 roShare: float = 0.1, failureRate: float = 0.0, recoverAfter: int = 20,
+                 dumpAtEnd: bool = True) -> None:
+        self.seed = seed
+        self.numOfTxns = numOfTxns
+        self.numOfVars = numOfVars
+        self.numOfSites = numOfSites
+        self.concurrency = concurrency
+        self.opsPerTxn = opsPerTxn
+        # fraction of read operations in read-write transactions
+        self.readRatio = readRatio
+        # Zipf exponent of the variable popularity, 0 is uniform
+        self.zipfS = zipfS
+        # fraction of transactions that are read-only
+        self.roShare = roShare
+        # probability of a site failure per generated line
+        self.failureRate = failureRate
+        # number of lines after which a failed site recovers
+        self.recoverAfter = recoverAfter
+        self.dumpAtEnd = dumpAtEnd
+
+    def config(self) -> dict:
+        return dict(vars(self))
+
+    def __iter__(self):
+        rand = random.Random(self.seed)
+        pickVar = var_picker(rand, self.numOfVars, self.zipfS)
+        active = dict()  # txnId -> [remaining ops, is read-only]
+        downSites = dict()  # siteId -> line at which it recovers
+        nextTxnId = 1
+        line = 0
+        while nextTxnId <= self.numOfTxns or active:
+            for siteId in [s for s, at in downSites.items() if at <= line]:
+                del downSites[siteId]
+                yield f'recover({siteId})'
+                line += 1
+            if self.failureRate and rand.random() < self.failureRate:
+                upSites = [s for s in range(1, self.numOfSites + 1) if s not in downSites]
+                if upSites:
+                    siteId = rand.choice(upSites)
+                    downSites[siteId] = line + 1 + rand.randint(1, max(1, self.recoverAfter))
+                    yield f'fail({siteId})'
+                    line += 1
+                    continue
+            if nextTxnId <= self.numOfTxns and (len(active) < self.concurrency or not active):
+                isReadOnly = rand.random() < self.roShare
+                active[nextTxnId] = [max(1, self.opsPerTxn), isReadOnly]
+                yield f'beginRO(T{nextTxnId})' if isReadOnly else f'begin(T{nextTxnId})'
+                nextTxnId += 1
+                line += 1
+                continue
+            txnId = rand.choice(list(active))
+            state = active[txnId]
+            if state[0] == 0:
+                del active[txnId]
+                yield f'end(T{txnId})'
+            else:
+                state[0] -= 1
+                varId = pickVar()
+                if state[1] or rand.random() < self.readRatio:
+                    yield f'R(T{txnId},x{varId})'
+                else:
+                    yield f'W(T{txnId},x{varId},{rand.randint(0, 9999)})'
+            line += 1
+        for siteId in downSites:
+            yield f'recover({siteId})'
+        if self.dumpAtEnd:
+            yield 'dump()'
+
+
+def var_picker(rand, numOfVars: int, zipfS: float):
+    # Function drawing a variable id, Zipf distributed with exponent zipfS (0 is
+    # uniform)
+    varIds = list(range(1, numOfVars + 1))
+    if zipfS <= 0:
+        return lambda: rand.choice(varIds)
+    # hot keys are spread over the variable space by a seeded permutation
+    rand.shuffle(varIds)
+    cumWeights = list(accumulate(1.0 / (rank ** zipfS) for rank in range(1, numOfVars + 1)))
+    return lambda: rand.choices(varIds, cum_weights=cumWeights)[0]
@@ -1,35 +1,214 @@
+import argparse
+import json
+import sys
+
 from dbms.site import Site
-from dbms.transaction_manager import TransactionManager
+from dbms.api import Engine
+from dbms.executor import ParallelExecutor
 from dbms.constants import DataType
+from dbms.placement import Placement
+from dbms.input_parser import Parser
+from dbms.events import make_sink
+from dbms.durability import SiteStorage, WriteAheadLog
+from dbms.var_store import STORES
+from dbms.distributed import RemoteSite
+from dbms.image import DatabaseImage
+from dbms.metrics import Metrics, OperationProfiler
+from dbms.deadlock import DEADLOCK_POLICIES, make_deadlock_policy
+from dbms.scheduler import SCHEDULERS
 
 class DB():
     NUM_OF_SITES = 10
     NUM_OF_VARS = 20
 
-    def __init__(self):
+    # dataDir: keep a write-ahead log and checkpoints of every site there and
+    # restore the sites from it if it already holds a previous run
+    # store: 'dict' or 'columnar' (array backed) storage of the site variables
+    # distributed: run every site in its own worker process
+    # image: start from a DatabaseImage file instead of the initial values
+    def __init__(self, numOfSites: int = None, numOfVars: int = None, dataDir: str = None,
+                 walGroupSize: int = 32, checkpointEvery: int = 1024, store: str = 'dict',
+                 distributed: bool = False, image: str = None):
+        if distributed and dataDir is not None:
+            raise ValueError('the distributed mode does not support a data directory')
+        self.image = DatabaseImage(image) if image is not None else None
+        if self.image is not None:
+            if numOfSites not in (None, self.image.numOfSites) or numOfVars not in (None, self.image.numOfVars):
+                self.image.close()
+                raise ValueError(f'{image} holds {self.image.numOfSites} sites and {self.image.numOfVars} variables')
+            numOfSites = self.image.numOfSites
+            numOfVars = self.image.numOfVars
+        self.numOfSites = numOfSites or self.NUM_OF_SITES
+        self.numOfVars = numOfVars or self.NUM_OF_VARS
+        if dataDir is not None:
+            try:
+                WriteAheadLog.checkLimits(self.numOfSites, self.numOfVars)
+            except ValueError:
+                if self.image is not None:
+                    self.image.close()
+                raise
+        self.dataDir = dataDir
+        self.walGroupSize = walGroupSize
+        self.checkpointEvery = checkpointEvery
+        self.storeClass = STORES[store]
+        self.distributed = distributed
         self.sites = {}
+        self.placement = None
+        # first timestamp of this run, after every restored commit
+        self.startTime = 0
 
         self.init_sites()
-    
+
     def init_sites(self):
-        for i in range(1, 1 + self.NUM_OF_SITES):
-            self.sites[i] = Site(i)
+        storages = {}
+        if self.dataDir is not None:
+            for i in range(1, 1 + self.numOfSites):
+                storages[i] = SiteStorage(self.dataDir, i, self.walGroupSize, self.checkpointEvery)
+        if self.image is not None:
+            self.sites, self.placement = self.image.buildSites(self.storeClass)
+            self.startTime = self.image.startTime
+            self.image.close()
+        else:
+            self._init_sites_from_scratch(storages)
+
+        allSites = list(self.sites.values())
+        restored = any(storage.exists() for storage in storages.values())
+        for siteId, storage in storages.items():
+            self.sites[siteId].attachStorage(storage)
+        if restored:
+            self.startTime = 1 + max(site.lastCommitTime() for site in allSites)
+        if self.distributed:
+            self.sites = {siteId: RemoteSite(site) for siteId, site in self.sites.items()}
+            self.placement.replaceSites(self.sites)
+
+    def _init_sites_from_scratch(self, storages):
+        self.placement = Placement(self.numOfSites, self.numOfVars)
+        for i in range(1, 1 + self.numOfSites):
+            self.sites[i] = Site(i, self.storeClass())
+            self.sites[i].attachPlacement(self.placement)
+
+        allSites = list(self.sites.values())
+        for i in range(1, 1 + self.numOfVars):
+            if i % 2 == 0:
+                # Even indexed variables are at all sites
+                for site in allSites:
+                    self._init_var(site, i, DataType.REPLICATED, storages.get(site.id))
+                self.placement.addVar(i, allSites, DataType.REPLICATED)
+            else:
+                # Odd indexed variables are at one site each
+                # (i.e. 1 + (index_number mod number_of_sites) )
+                site = self.sites[1 + i % self.numOfSites]
+                self._init_var(site, i, DataType.NON_REPLICATED, storages.get(site.id))
+                self.placement.addVar(i, [site], DataType.NON_REPLICATED)
+
+    def _init_var(self, site, varId, datatype, storage):
+        if storage is not None and storage.exists():
+            # values are restored from the site's checkpoint and log
+            site.registerVar(varId, datatype)
+        else:
+            site.initVarValues(varId, datatype)
+
+    def run(self, operations=None, events=None, metrics: Metrics = None, profilePath: str = None,
+            deadlockPolicy=None, scheduler=None, catchUpOnRecover: bool = False, numOfThreads: int = 1):
+        # the text front end: parsed operations in, formatted events out
+        if events is None:
+            events = make_sink('text', sys.stdout)
+        engine = Engine(self, events, deadlockPolicy, scheduler, catchUpOnRecover)
+        transactionManager = engine.tm
+        if metrics is not None:
+            metrics.attach(transactionManager)
+        profiler = OperationProfiler(transactionManager) if profilePath is not None else None
+
+        try:
+            if numOfThreads > 1:
+                ParallelExecutor(transactionManager, numOfThreads).run(operations)
+            else:
+                engine.run(operations)
+        finally:
+            if profiler is not None:
+                profiler.dump(profilePath)
+            self.close()
+        return transactionManager
 
-        for i in range(1, 1 + self.NUM_OF_VARS):
-            for site_id, site in self.sites.items():
-                if i % 2 == 0:
-                    # Even indexed variables are at all sites
-                    site.initVarValues(i, DataType.REPLICATED)
-                elif site_id == 1 + i % 10:
-                    # Odd indexed variables are at one site each
-                    # (i.e. 1 + (index_number mod 10) )
-                    site.initVarValues(i, DataType.NON_REPLICATED)
+    def saveImage(self, path: str, nextTime: int = None):
+        # Committed state of every site; nextTime: first timestamp of a run
+        # starting from the image (default: after every commit)
+        if nextTime is None:
+            nextTime = max(self.startTime, 1 + max(site.lastCommitTime() for site in self.sites.values()))
+        DatabaseImage.save(path, self.numOfSites, self.numOfVars, nextTime, self.placement,
+                           [self.sites[siteId] for siteId in sorted(self.sites)])
 
-    def run(self):
-        transactionManager = TransactionManager(self.sites)
+    def close(self):
+        for site in self.sites.values():
+            site.close()
 
-        transactionManager.start()
+def parse_args():
+    parser = argparse.ArgumentParser(description='RepCRec')
+    parser.add_argument('--sites', type=int, default=None, help=f'number of sites (default {DB.NUM_OF_SITES})')
+    parser.add_argument('--vars', type=int, default=None, help=f'number of variables (default {DB.NUM_OF_VARS})')
+    parser.add_argument('--input', default=None, help='read instructions from this file instead of stdin')
+    parser.add_argument('--mmap', action='store_true', help='memory-map the --input file')
+    parser.add_argument('--data-dir', default=None,
+                        help='keep a write-ahead log and checkpoints of the sites in this directory')
+    parser.add_argument('--wal-group', type=int, default=32, help='commits per write-ahead log flush')
+    parser.add_argument('--checkpoint-every', type=int, default=1024, help='commits per site between checkpoints')
+    parser.add_argument('--output', choices=['text', 'jsonl', 'counters', 'silent'], default='text',
+                        help='event output format')
+    parser.add_argument('--distributed', action='store_true', help='run every site in its own worker process')
+    parser.add_argument('--serve', action='store_true',
+                        help='serve clients over TCP instead of reading the instructions from stdin')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on with --serve')
+    parser.add_argument('--port', type=int, default=7070, help='port to listen on with --serve')
+    parser.add_argument('--store', choices=sorted(STORES), default='dict',
+                        help='storage of the site variables, columnar keeps them in dense arrays')
+    parser.add_argument('--metrics', action='store_true',
+                        help='collect latency, lock wait, queue depth and abort cause metrics (shown by stats())')
+    parser.add_argument('--metrics-out', default=None,
+                        help='write the stats() JSON to this file at exit (implies --metrics)')
+    parser.add_argument('--profile', default=None,
+                        help='profile the handling of every operation with cProfile and write the stats to this file')
+    parser.add_argument('--deadlock', choices=sorted(DEADLOCK_POLICIES), default='detect',
+                        help='deadlock handling: waits-for cycle detection (default), wait-die, wound-wait '
+                             'or aborting transactions waiting too long')
+    parser.add_argument('--deadlock-timeout', type=int, default=None,
+                        help='ticks an operation may wait before its transaction is aborted with --deadlock timeout')
+    parser.add_argument('--scheduler', choices=sorted(SCHEDULERS), default='wake-all',
+                        help='retry of operations on hold: wake-all re-runs every operation on a released variable, '
+                             'event only those that can run, in FIFO order')
+    parser.add_argument('--recover-catch-up', action='store_true',
+                        help='a recovering site copies its replicated variables from an up peer so they are '
+                             'readable right away')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='run independent reads and writes of an input file on this many threads '
+                             '(same output as with one)')
+    parser.add_argument('--image', default=None,
+                        help='start from this database image instead of the initial values')
+    parser.add_argument('--save-image', default=None,
+                        help='save the committed state to this database image at exit')
+    args = parser.parse_args()
+    if args.distributed and args.data_dir is not None:
+        parser.error('--distributed does not support --data-dir')
+    return args
 
 if __name__ == '__main__':
-    db = DB()
-    db.run()
+    args = parse_args()
+    db = DB(args.sites, args.vars, args.data_dir, args.wal_group, args.checkpoint_every, args.store,
+            args.distributed, args.image)
+    metrics = Metrics() if args.metrics or args.metrics_out else None
+    deadlockPolicy = make_deadlock_policy(args.deadlock, args.deadlock_timeout)
+    scheduler = SCHEDULERS[args.scheduler]()
+    nextTime = None
+    if args.serve:
+        from dbms.server import serve
+        tm = serve(db, args.host, args.port, 'jsonl' if args.output == 'jsonl' else 'text', metrics,
+                   deadlockPolicy, scheduler, args.recover_catch_up)
+    else:
+        parser = Parser(args.input, args.mmap, db.startTime)
+        tm = db.run(parser, make_sink(args.output, sys.stdout), metrics, args.profile, deadlockPolicy, scheduler,
+                    args.recover_catch_up, args.threads if args.input is not None or not sys.stdin.isatty() else 1)
+        nextTime = parser.current_time
+    if args.save_image:
+        db.saveImage(args.save_image, nextTime)
+    if args.metrics_out:
+        with open(args.metrics_out, 'w') as f:
+            json.dump(tm.collectStats(), f, indent=2, sort_keys=True)
@@ -0,0 +1,114 @@
+# Runs every input file of a directory on a process pool and compares each
+# result with the expected output.
+#
+#   python src/run_batch.py ./inputs ./outputs            # verify
+#   python src/run_batch.py ./inputs ./outputs --write    # (re)generate outputs
+import argparse
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from main import DB
+from dbms.events import TextSink
+from dbms.input_parser import Parser
+from dbms.var_store import STORES
+
+_TEST_NAME = re.compile(r'^test(.*)\.txt$')
+
+
+def output_name(inputName):
+    # test12.txt -> out12.txt_out, anything else -> <name>_out
+    m = _TEST_NAME.match(inputName)
+    if m:
+        return f'out{m.group(1)}.txt_out'
+    return inputName + '_out'
+
+
+def discover(inDir, pattern):
+    regex = re.compile(pattern)
+    names = [name for name in os.listdir(inDir) if regex.match(name)]
+
+    def sort_key(name):
+        # test2 before test10
+        return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+    return sorted(names, key=sort_key)
+
+
+def run_file(task):
+    inPath, outPath, write, numOfSites, numOfVars, store, image = task
+    start = time.perf_counter()
+    # a fresh DB per file, the interpreter and imports are reused by the worker
+    if image is not None:
+        # every worker loads the sites from the same image file
+        db = DB(store=store, image=image)
+    else:
+        db = DB(numOfSites, numOfVars, store=store)
+    out = io.StringIO()
+    error = None
+    try:
+        db.run(Parser(inPath), TextSink(out))
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    result = out.getvalue()
+    elapsed = time.perf_counter() - start
+
+    if error is not None:
+        status = 'ERROR'
+    elif write:
+        with open(outPath, 'w') as f:
+            f.write(result)
+        status = 'WRITTEN'
+    elif not os.path.exists(outPath):
+        status = 'NO_GOLDEN'
+    else:
+        with open(outPath) as f:
+            status = 'OK' if f.read() == result else 'DIFF'
+    return os.path.basename(inPath), status, elapsed, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description='run and verify a batch of input files')
+    parser.add_argument('indir')
+    parser.add_argument('outdir')
+    parser.add_argument('--write', action='store_true', help='write the outputs instead of comparing them')
+    parser.add_argument('--pattern', default=r'test.*\.txt$', help='regex of the input file names')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--sites', type=int, default=DB.NUM_OF_SITES)
+    parser.add_argument('--vars', type=int, default=DB.NUM_OF_VARS)
+    parser.add_argument('--store', choices=sorted(STORES), default='dict', help='storage of the site variables')
+    parser.add_argument('--image', help='start every file from this database image (see main.py --save-image)')
+    parser.add_argument('--quiet', action='store_true', help='only print failures and the summary')
+    args = parser.parse_args()
+
+    names = discover(args.indir, args.pattern)
+    if args.write:
+        os.makedirs(args.outdir, exist_ok=True)
+    tasks = [(os.path.join(args.indir, name), os.path.join(args.outdir, output_name(name)),
+              args.write, args.sites, args.vars, args.store, args.image) for name in names]
+
+    start = time.perf_counter()
+    failed = 0
+    counts = dict()
+    chunksize = max(1, len(tasks) // (4 * max(1, args.jobs)))
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for name, status, elapsed, error in executor.map(run_file, tasks, chunksize=chunksize):
+            counts[status] = counts.get(status, 0) + 1
+            if status in ('DIFF', 'ERROR'):
+                failed += 1
+            if not args.quiet or status in ('DIFF', 'ERROR'):
+                line = f'{status:>9} {elapsed * 1000:9.2f} ms  {name}'
+                if error:
+                    line += f'  {error}'
+                print(line)
+    total = time.perf_counter() - start
+
+    summary = ', '.join(f'{n} {status}' for status, n in sorted(counts.items()))
+    print(f'{len(tasks)} files in {total:.2f}s ({summary})')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# Discrete-event simulation: simulated clients run seeded transactions against
+# sites with modelled service times, link delays and failures, in virtual time,
+# and the throughput, commit latency and blocking time are reported.
+#
+#   python src/simulate.py --clients 32 --txns 5000 --service exp:0.2 --link const:0.5
+#   python src/simulate.py --site-service 3=exp:20 --time-to-failure exp:2000 --downtime exp:200
+import argparse
+import json
+import sys
+
+from main import DB
+from dbms.deadlock import DEADLOCK_POLICIES, make_deadlock_policy
+from dbms.events import make_sink
+from dbms.scheduler import SCHEDULERS
+from dbms.simulation import Simulator, make_distribution
+from dbms.var_store import STORES
+
+
+def distribution(spec):
+    try:
+        make_distribution(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+def site_distribution(spec):
+    # SITE=DISTRIBUTION
+    siteId, sep, rest = spec.partition('=')
+    if not sep or not siteId.isdigit():
+        raise argparse.ArgumentTypeError(f'expected SITE=DISTRIBUTION, got {spec!r}')
+    return int(siteId), distribution(rest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='discrete-event simulation of clients, sites and failures')
+    parser.add_argument('--sites', type=int, default=DB.NUM_OF_SITES)
+    parser.add_argument('--vars', type=int, default=DB.NUM_OF_VARS)
+    parser.add_argument('--store', choices=sorted(STORES), default='dict', help='storage of the site variables')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clients', type=int, default=8, help='number of simulated clients')
+    parser.add_argument('--txns', type=int, default=1000, help='number of transactions run by all clients')
+    parser.add_argument('--ops-per-txn', type=int, default=5)
+    parser.add_argument('--read-ratio', type=float, default=0.5, help='share of reads in read-write transactions')
+    parser.add_argument('--zipf', type=float, default=0.0, help='Zipf exponent of variable popularity (0: uniform)')
+    parser.add_argument('--ro-share', type=float, default=0.1, help='share of read-only transactions')
+    parser.add_argument('--think', type=distribution, default='exp:1',
+                        help='client delay before each instruction, in ms (const:V, exp:MEAN, uniform:LOW:HIGH, '
+                             'lognormal:MU:SIGMA)')
+    parser.add_argument('--service', type=distribution, default='exp:0.2', help='service time of a site request, in ms')
+    parser.add_argument('--link', type=distribution, default='const:0.5', help='one-way link delay to a site, in ms')
+    parser.add_argument('--site-service', type=site_distribution, action='append', default=[],
+                        help='SITE=DISTRIBUTION: service time of one site (repeatable)')
+    parser.add_argument('--site-link', type=site_distribution, action='append', default=[],
+                        help='SITE=DISTRIBUTION: link delay of one site (repeatable)')
+    parser.add_argument('--time-to-failure', type=distribution, default=None,
+                        help='time from a recovery (or the start) to the next failure of each site, in ms '
+                             '(default: no failures)')
+    parser.add_argument('--downtime', type=distribution, default='exp:100', help='time a failed site stays down, in ms')
+    parser.add_argument('--duration', type=float, default=None, help='stop at this virtual time (ms)')
+    parser.add_argument('--client-timeout', type=float, default=1000.0,
+                        help='ms an instruction may stay on hold before its client aborts the transaction '
+                             '(0: no limit)')
+    parser.add_argument('--deadlock', choices=sorted(DEADLOCK_POLICIES), default='detect', help='deadlock policy')
+    parser.add_argument('--deadlock-timeout', type=int, default=None,
+                        help='wait limit with --deadlock timeout, in virtual microseconds')
+    parser.add_argument('--scheduler', choices=sorted(SCHEDULERS), default='wake-all',
+                        help='retry of operations on hold')
+    parser.add_argument('--recover-catch-up', action='store_true',
+                        help='a recovering site copies its replicated variables from an up peer')
+    parser.add_argument('--output', choices=['text', 'jsonl', 'counters', 'silent'], default='silent',
+                        help='event log of the engine (timestamps in virtual microseconds)')
+    parser.add_argument('--json', default=None, help='write the report to this JSON file')
+    args = parser.parse_args()
+
+    db = DB(args.sites, args.vars, store=args.store)
+    events = make_sink(args.output, sys.stdout)
+    simulator = Simulator(
+        db, args.clients, args.txns, args.seed, args.ops_per_txn, args.read_ratio, args.zipf, args.ro_share,
+        args.think, args.service, args.link, dict(args.site_service), dict(args.site_link), args.time_to_failure,
+        args.downtime, args.duration, args.client_timeout or None, events,
+        make_deadlock_policy(args.deadlock, args.deadlock_timeout), SCHEDULERS[args.scheduler](), args.recover_catch_up)
+    try:
+        report = simulator.run()
+    finally:
+        events.close()
+        db.close()
+
+    txns = report['transactions']
+    print(f'{report["virtual_time_ms"]:.1f} virtual ms in {report["wall_time_sec"]:.3f}s '
+          f'({report["events"]} events){"  STUCK: every client waits" if report["stuck"] else ""}')
+    print(f'transactions: {txns["started"]}  commits: {txns["committed"]}  aborts: {txns["aborted"]}  '
+          f'timed out: {txns["timed_out"]}  unfinished: {txns["unfinished"]}  '
+          f'throughput: {report["throughput_per_sec"]:.1f} commits/sec')
+    print(f'{"ms":>12} {"count":>8} {"mean":>9} {"p50":>9} {"p90":>9} {"p99":>9} {"max":>9}')
+    latency = report['commit_latency_ms']
+    rows = [('commit rw', latency['read_write']), ('commit ro', latency['read_only']),
+            ('blocked op', report['blocking_ms'])]
+    for name, summary in rows:
+        if summary['count']:
+            print(f'{name:>12} {summary["count"]:>8} {summary["mean"]:>9.2f} {summary["p50"]:>9.2f} '
+                  f'{summary["p90"]:>9.2f} {summary["p99"]:>9.2f} {summary["max"]:>9.2f}')
+        else:
+            print(f'{name:>12} {0:>8}')
+    print(f'{"site":>5} {"requests":>9} {"utilization":>12} {"failures":>9}')
+    for siteId, site in report['sites'].items():
+        print(f'{siteId:>5} {site["requests"]:>9} {site["utilization"]:>12.1%} {site["failures"]:>9}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
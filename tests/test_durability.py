@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from main import DB
+from dbms.api import Engine, TransactionError
+from dbms.durability import WriteAheadLog
+
+
+def test_out_of_range_value_is_not_committed_nor_logged(tmp_path):
+    dataDir = str(tmp_path)
+    engine = Engine(DB(dataDir=dataDir, walGroupSize=1))
+    with engine.begin() as t:
+        with pytest.raises(TransactionError):
+            t.write(2, 2 ** 64)
+        t.write(4, 44)
+    before = engine.dump()
+    engine.close()
+
+    # restored from the log, the same state as in memory before
+    engine = Engine(DB(dataDir=dataDir))
+    assert engine.dump() == before
+    assert all(values[4] == 44 and values[2] == 20 for values in before.values())
+    engine.close()
+
+
+def test_ids_the_log_cannot_hold_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        DB(WriteAheadLog.MAX_SITE_ID + 1, 20, str(tmp_path))
+    with pytest.raises(ValueError):
+        DB(10, WriteAheadLog.MAX_VAR_ID + 1, str(tmp_path))
+    assert os.listdir(tmp_path) == []
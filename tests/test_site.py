@@ -0,0 +1,21 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from main import DB
+
+
+def test_pickled_site_does_not_grow_with_the_number_of_sites():
+    # site 1 holds every replicated variable and fewer non-replicated ones
+    # as sites are added; the other sites are not pickled along with it
+    sizes = [len(pickle.dumps(DB(numOfSites, 1000).sites[1])) for numOfSites in (2, 10, 40)]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_unpickled_site_has_no_placement():
+    db = DB(10, 100)
+    site = pickle.loads(pickle.dumps(db.sites[1]))
+    assert site.placement is None
+    assert site.committedValues() == db.sites[1].committedValues()
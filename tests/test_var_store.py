@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from main import DB
+from dbms.api import Engine, TransactionError
+
+
+@pytest.mark.parametrize('store', ['dict', 'columnar'])
+def test_write_outside_int64_is_rejected(store):
+    engine = Engine(DB(store=store))
+    with engine.begin() as t:
+        # x2 is replicated at every site
+        with pytest.raises(TransactionError):
+            t.write(2, 2 ** 63)
+        with pytest.raises(TransactionError):
+            t.write(2, -2 ** 63 - 1)
+        t.write(2, 2 ** 63 - 1)
+    # committed on every replica
+    assert engine.tm.finishedTransactions.outcome(t.id) is True
+    dump = engine.dump(varId=2)
+    assert len(dump) == 10
+    assert all(values == {2: 2 ** 63 - 1} for values in dump.values())
+    engine.close()